@@ -0,0 +1,402 @@
+# Retrieval benchmark suite for RevereRAGSystem
+#
+#   python benchmarks/retrieval_benchmark.py run --sizes 1000,10000 --output results.json
+#   python benchmarks/retrieval_benchmark.py compare baseline.json results.json
+#
+# Every (corpus, size, store, embedder) combination runs in a fresh process so
+# peak RSS is measured per run. Corpora and queries are generated from a seed,
+# so two runs on the same machine measure the same work.
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from ingestion import chunk_text  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_PATH = os.path.join(os.path.dirname(SERVER_DIR), "public", "FY2025-Budget.md")
+LABELLED_QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "budget_queries.json")
+
+STORES = ("chroma", "memory")
+HASHING_MODEL = "hashing-384"
+
+_SYLLABLES = ["ra", "ve", "re", "mo", "ta", "lin", "ber", "son", "qua", "dex",
+              "ul", "om", "pri", "sta", "gen", "cor", "bea", "ch", "wo", "nd"]
+_DOMAIN_WORDS = ["budget", "revere", "beach", "school", "police", "fire", "water", "sewer",
+                 "tax", "levy", "council", "mayor", "library", "park", "transit", "housing",
+                 "permit", "salary", "capital", "fund", "grant", "department", "service", "city"]
+
+
+def synthetic_corpus(size: int, seed: int) -> Tuple[List[str], List[int]]:
+    """
+    Zipf-distributed pseudo-text documents
+
+    Returns:
+        (documents, groups); every synthetic document is its own group
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = list(_DOMAIN_WORDS)
+    for a in _SYLLABLES:
+        for b in _SYLLABLES:
+            vocabulary.append(a + b)
+            vocabulary.append(a + b + _SYLLABLES[(len(vocabulary) * 7) % len(_SYLLABLES)])
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) ** 1.1
+    weights /= weights.sum()
+
+    lengths = rng.integers(80, 200, size=size)
+    words = rng.choice(len(vocabulary), size=int(lengths.sum()), p=weights)
+    documents, position = [], 0
+    for length in lengths:
+        tokens = [vocabulary[i] for i in words[position:position + length]]
+        position += length
+        sentences = [" ".join(tokens[i:i + 12]).capitalize() + "." for i in range(0, len(tokens), 12)]
+        documents.append(" ".join(sentences))
+    return documents, list(range(size))
+
+
+def budget_corpus(size: int, seed: int, path: str, max_chars: int = 1200) -> Tuple[List[str], List[int]]:
+    """
+    Chunks of the FY2025 budget, scaled to the requested size
+
+    Beyond the real chunk count, perturbed copies (10% of words dropped) are
+    appended; copies share the group of their source chunk.
+
+    Returns:
+        (documents, groups)
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        base = [chunk for _, chunk in chunk_text(file.read(), max_chars)]
+
+    if size <= len(base):
+        return base[:size], list(range(size))
+
+    rng = np.random.default_rng(seed)
+    documents, groups = list(base), list(range(len(base)))
+    copy = 1
+    while len(documents) < size:
+        for group, chunk in enumerate(base[:size - len(documents)]):
+            words = chunk.split()
+            keep = rng.random(len(words)) >= 0.1
+            documents.append(f"Section {copy}. " + " ".join(w for w, k in zip(words, keep) if k))
+            groups.append(group)
+        copy += 1
+    return documents, groups
+
+
+def known_item_queries(documents: List[str], groups: List[int], count: int,
+                       seed: int) -> List[Tuple[str, int]]:
+    """
+    Queries made from a word window of a random document with ~20% of words dropped
+
+    Returns:
+        (query, relevant group) pairs
+    """
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for index in rng.integers(0, len(documents), size=count):
+        words = documents[index].split()
+        length = int(rng.integers(8, 15))
+        start = int(rng.integers(0, max(1, len(words) - length)))
+        window = words[start:start + length]
+        keep = rng.random(len(window)) >= 0.2
+        kept = [word for word, k in zip(window, keep) if k]
+        queries.append((" ".join(kept if len(kept) >= 4 else window), groups[index]))
+    return queries
+
+
+def labelled_queries(documents: List[str]) -> List[Tuple[str, set]]:
+    """Hand-written budget questions; relevant chunks are those containing the labelled phrase"""
+    with open(LABELLED_QUERIES_PATH, 'r', encoding='utf-8') as file:
+        labels = json.load(file)
+
+    lowered = [document.lower() for document in documents]
+    queries = []
+    for label in labels:
+        phrase = label['relevant_contains'].lower()
+        relevant = {f"doc-{i}" for i, text in enumerate(lowered) if phrase in text}
+        if relevant:
+            queries.append((label['query'], relevant))
+    return queries
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3), "mean": round(float(values.mean()), 3)}
+
+
+def run_one(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build one corpus into one backend and measure it
+
+    Args:
+        config: corpus, size, store, embedder, seed, queries, ask_queries, k,
+            batch_size and budget_path
+
+    Returns:
+        Result record (or a record with 'skipped' when the backend is missing)
+    """
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    import rag_system
+    from rag_system import RevereRAGSystem
+    from profiling import process_memory
+
+    result = {key: config[key] for key in ("corpus", "size", "store", "embedder")}
+    if config["store"] == "chroma" and not rag_system.CHROMADB_AVAILABLE:
+        result["skipped"] = "chromadb not installed"
+        return result
+
+    seed, k = config["seed"], config["k"]
+    if config["corpus"] == "budget":
+        documents, groups = budget_corpus(config["size"], seed, config["budget_path"])
+    else:
+        documents, groups = synthetic_corpus(config["size"], seed)
+    ids = [f"doc-{i}" for i in range(len(documents))]
+    group_ids: Dict[int, set] = {}
+    for doc_id, group in zip(ids, groups):
+        group_ids.setdefault(group, set()).add(doc_id)
+    queries = [(query, group_ids[group]) for query, group in
+               known_item_queries(documents, groups, config["queries"], seed)]
+    labelled = labelled_queries(documents) if config["corpus"] == "budget" else []
+
+    embedding_model = HASHING_MODEL if config["embedder"] == "hashing" else config["embedder"]
+    directory = tempfile.mkdtemp(prefix="revere-bench-")
+    try:
+        started = time.perf_counter()
+        rag = RevereRAGSystem(collection_name="benchmark", persist_directory=directory,
+                              embedding_model=embedding_model, embedding_cache_mb=0,
+                              near_duplicate_threshold=None, seed_knowledge_base=False,
+                              use_chromadb=config["store"] == "chroma")
+        result["init_seconds"] = round(time.perf_counter() - started, 3)
+        result["embedding_backend"] = (type(rag.embedding_model).__name__ if rag.embedding_model
+                                       else "HashingEmbedder (fallback)")
+
+        batch_size = config["batch_size"]
+        started = time.perf_counter()
+        for start in range(0, len(documents), batch_size):
+            rag.add_documents(
+                documents[start:start + batch_size],
+                [{'source': config["corpus"], 'category': config["corpus"]}] * len(documents[start:start + batch_size]),
+                ids[start:start + batch_size]
+            )
+        ingest_seconds = time.perf_counter() - started
+        result["ingest_seconds"] = round(ingest_seconds, 3)
+        result["ingest_docs_per_sec"] = round(len(documents) / ingest_seconds, 1)
+        result["rss_after_ingest_bytes"] = process_memory().get("vmrss_bytes")
+
+        # One untimed query pays for lazy initialization
+        rag.search_handles(queries[0][0], k=k)
+
+        def evaluate(query_set):
+            latencies, hits_1, hits_k = [], 0, 0
+            for query, relevant in query_set:
+                started = time.perf_counter()
+                found = [document['id'] for document in rag.search(query, k=k)]
+                latencies.append(time.perf_counter() - started)
+                hits_1 += bool(found[:1] and found[0] in relevant)
+                hits_k += bool(relevant.intersection(found))
+            count = max(len(query_set), 1)
+            return latencies, round(hits_1 / count, 4), round(hits_k / count, 4)
+
+        latencies, result["recall_at_1"], result["recall_at_k"] = evaluate(queries)
+        result["search_ms"] = _percentiles(latencies)
+        if labelled:
+            _, result["labelled_recall_at_1"], result["labelled_recall_at_k"] = evaluate(labelled)
+            result["labelled_queries"] = len(labelled)
+
+        latencies = []
+        for query, _ in queries[:config["ask_queries"]]:
+            started = time.perf_counter()
+            rag.ask(query)
+            latencies.append(time.perf_counter() - started)
+        result["ask_ms"] = _percentiles(latencies)
+
+        memory = process_memory()
+        result["peak_rss_bytes"] = memory.get("vmhwm_bytes")
+        result["documents"] = rag.get_statistics()["total_documents"]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+
+def _environment(args: argparse.Namespace) -> Dict[str, Any]:
+    import importlib.util
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "chromadb_available": importlib.util.find_spec("chromadb") is not None,
+        "sentence_transformers_available": importlib.util.find_spec("sentence_transformers") is not None,
+        "args": {key: value for key, value in vars(args).items() if key != "func"}
+    }
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every configured combination and collect the results"""
+    configs = [
+        {"corpus": corpus, "size": size, "store": store, "embedder": embedder,
+         "seed": args.seed, "queries": args.queries, "ask_queries": args.ask_queries,
+         "k": args.k, "batch_size": args.batch_size, "budget_path": args.budget_path}
+        for corpus in args.corpora.split(",")
+        for size in (int(size) for size in args.sizes.split(","))
+        for store in args.stores.split(",")
+        for embedder in args.embedders.split(",")
+    ]
+
+    report = {"meta": _environment(args), "results": []}
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        label = f"{config['corpus']}/{config['size']}/{config['store']}/{config['embedder']}"
+        print(f"⏱️ {label} ...", file=sys.stderr, flush=True)
+        try:
+            if args.in_process:
+                result = run_one(config)
+            else:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_one, (config,))
+        except Exception as e:
+            result = {key: config[key] for key in ("corpus", "size", "store", "embedder")}
+            result["error"] = str(e)
+        report["results"].append(result)
+
+        if "search_ms" in result:
+            print(f"   {result['ingest_docs_per_sec']} docs/s, search p95 {result['search_ms']['p95']} ms, "
+                  f"recall@{args.k} {result['recall_at_k']}", file=sys.stderr, flush=True)
+        else:
+            print(f"   {result.get('skipped') or result.get('error')}", file=sys.stderr, flush=True)
+    return report
+
+
+# metric path -> True if higher is better
+COMPARED_METRICS = {
+    ("ingest_docs_per_sec",): True,
+    ("search_ms", "p50"): False,
+    ("search_ms", "p95"): False,
+    ("search_ms", "p99"): False,
+    ("ask_ms", "p50"): False,
+    ("ask_ms", "p95"): False,
+    ("peak_rss_bytes",): False,
+    ("recall_at_1",): True,
+    ("recall_at_k",): True,
+    ("labelled_recall_at_k",): True,
+}
+
+
+def _lookup(result: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    value: Any = result
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    Relative change of every shared metric between two reports
+
+    Args:
+        baseline: Earlier report
+        current: New report
+        threshold: Relative change in the bad direction counted as a regression
+
+    Returns:
+        One row per (run, metric) present in both reports
+    """
+    def key(result):
+        return (result["corpus"], result["size"], result["store"], result["embedder"])
+
+    baseline_runs = {key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = baseline_runs.get(key(result))
+        if before is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            old, new = _lookup(before, path), _lookup(result, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            rows.append({"run": "/".join(str(part) for part in key(result)), "metric": ".".join(path),
+                         "baseline": old, "current": new, "change": round(change, 4),
+                         "regression": worse > threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RevereRAGSystem retrieval")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run the benchmark suite")
+    run.add_argument("--corpora", default="synthetic,budget")
+    run.add_argument("--sizes", default="1000,10000,100000")
+    run.add_argument("--stores", default=",".join(STORES))
+    run.add_argument("--embedders", default="all-MiniLM-L6-v2,hashing",
+                     help="Embedding models; 'hashing' is the download-free hashing embedder")
+    run.add_argument("--queries", type=int, default=200, help="Known-item queries per run")
+    run.add_argument("--ask-queries", type=int, default=100, help="Queries also timed through ask()")
+    run.add_argument("--k", type=int, default=5)
+    run.add_argument("--batch-size", type=int, default=500)
+    run.add_argument("--seed", type=int, default=1234)
+    run.add_argument("--budget-path", default=DEFAULT_BUDGET_PATH)
+    run.add_argument("--in-process", action="store_true", help="Skip per-run processes (RSS is then cumulative)")
+    run.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+    compare = subparsers.add_parser("compare", help="Compare two JSON reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1,
+                         help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_suite(args)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as file:
+                file.write(text + "\n")
+        else:
+            print(text)
+    else:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        with open(args.current, 'r', encoding='utf-8') as file:
+            current = json.load(file)
+        rows = compare_reports(baseline, current, args.threshold)
+        for row in rows:
+            flag = "  ⚠️ REGRESSION" if row["regression"] else ""
+            print(f"{row['run']:<40} {row['metric']:<22} {row['baseline']:>14} -> {row['current']:<14} "
+                  f"{row['change'] * 100:+.1f}%{flag}")
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# WebSocket load generator for the /ws endpoint
+#
+# Start the server with the deterministic speech recognizer, then step the
+# number of simulated clients to find the saturation point (the stub backend
+# also stands in for the live MBTA feed, so transit questions stay local):
+#
+#   REVERE_STT_BACKEND=stub REVERE_STT_STUB_LATENCY_MS=150 python revere_enhanced_server.py
+#   python benchmarks/ws_load_test.py --clients 100,250,500,1000 --duration 30 --output load.json
+#
+# Each client follows a seeded Poisson schedule of text_input, ping and binary
+# audio frames. The server answers one message at a time per connection, so
+# responses are matched to requests in order. A request that times out stays
+# queued until its late reply arrives, which is then discarded.
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import multiprocessing
+from collections import deque
+from typing import List, Dict, Any
+
+import numpy as np
+import websockets
+
+TEXT_QUERIES = [
+    "hi",
+    "What is Revere Beach?",
+    "How do I contact City Hall?",
+    "When is the next Blue Line train?",
+    "Tell me about schools in Revere",
+    "What are the City Hall hours?",
+    "thanks!",
+    "What is the FY2025 budget for public works?",
+]
+
+MESSAGE_TYPES = ("text", "ping", "audio")
+SAMPLE_RATE = 16000
+
+
+def _audio_frame(rng: np.random.Generator, seconds: float, silent: bool) -> bytes:
+    """16 kHz mono 16-bit PCM: a noisy tone, or near-silence"""
+    count = int(SAMPLE_RATE * seconds)
+    if silent:
+        return rng.integers(-50, 50, size=count, dtype=np.int16).astype('<i2').tobytes()
+    t = np.arange(count) / SAMPLE_RATE
+    tone = 8000 * np.sin(2 * math.pi * rng.uniform(120, 400) * t) + rng.normal(0, 500, count)
+    return np.clip(tone, -32768, 32767).astype('<i2').tobytes()
+
+
+class _Stats:
+    """Raw samples from one process; merged by the parent"""
+
+    def __init__(self):
+        self.connect_latencies: List[float] = []
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.sent = {kind: 0 for kind in MESSAGE_TYPES}
+        self.latencies: Dict[str, List[float]] = {kind: [] for kind in MESSAGE_TYPES + ("stt",)}
+        self.timeouts = {kind: 0 for kind in MESSAGE_TYPES}
+        self.errors = {kind: 0 for kind in MESSAGE_TYPES}
+        self.no_speech = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+async def _client(index: int, args: argparse.Namespace, stats: _Stats, start_at: float, stop_at: float):
+    rng = np.random.default_rng(args.seed * 100003 + index)
+    await asyncio.sleep(max(0.0, start_at - time.perf_counter()))
+
+    started = time.perf_counter()
+    try:
+        websocket = await asyncio.wait_for(
+            websockets.connect(args.url, max_size=None, ping_interval=None, open_timeout=args.timeout),
+            timeout=args.timeout)
+    except Exception:
+        stats.connect_failures += 1
+        return
+    stats.connect_latencies.append(time.perf_counter() - started)
+
+    # [kind, sent_at, timed_out] in send order
+    pending: deque = deque()
+    rates = np.array([args.text_rate, args.ping_rate, args.audio_rate])
+    total_rate = rates.sum()
+
+    def expire(now: float):
+        # Timed-out requests keep their place so their late replies are not
+        # taken for the answers to later requests
+        for entry in pending:
+            if not entry[2] and now - entry[1] > args.timeout:
+                entry[2] = True
+                stats.timeouts[entry[0]] += 1
+
+    async def receive():
+        while True:
+            try:
+                raw = await asyncio.wait_for(websocket.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                expire(time.perf_counter())
+                # Once sending stopped, replies still owed only to timed-out requests are not awaited
+                if time.perf_counter() >= stop_at and all(entry[2] for entry in pending):
+                    return
+                continue
+            now = time.perf_counter()
+            if isinstance(raw, bytes) or not pending:
+                continue
+            expire(now)
+            message_type = json.loads(raw).get("type")
+            kind, sent_at, timed_out = pending[0]
+            record = not timed_out
+
+            if message_type == "pong" and kind == "ping":
+                if record:
+                    stats.latencies["ping"].append(now - sent_at)
+                pending.popleft()
+            elif message_type == "text_response" and kind in ("text", "audio"):
+                if record:
+                    stats.latencies[kind].append(now - sent_at)
+                pending.popleft()
+            elif message_type == "transcription_complete" and kind == "audio":
+                if record:
+                    stats.latencies["stt"].append(now - sent_at)
+            elif message_type == "audio_received" and kind == "audio":
+                if record:
+                    stats.latencies["stt"].append(now - sent_at)
+                    stats.no_speech += 1
+                pending.popleft()
+            elif message_type == "error":
+                if record:
+                    stats.errors[kind] += 1
+                pending.popleft()
+
+    async def send():
+        while total_rate > 0:
+            await asyncio.sleep(rng.exponential(1 / total_rate))
+            if time.perf_counter() >= stop_at:
+                return
+            kind = MESSAGE_TYPES[rng.choice(3, p=rates / total_rate)]
+            if kind == "text":
+                payload = json.dumps({"type": "text_input", "text": TEXT_QUERIES[rng.integers(len(TEXT_QUERIES))]})
+            elif kind == "ping":
+                payload = json.dumps({"type": "ping"})
+            else:
+                payload = _audio_frame(rng, args.audio_seconds, rng.random() < args.silence_ratio)
+            pending.append([kind, time.perf_counter(), False])
+            await websocket.send(payload)
+            stats.sent[kind] += 1
+
+    receiver = asyncio.create_task(receive())
+    try:
+        await send()
+        await receiver
+    except websockets.ConnectionClosed:
+        stats.disconnects += 1
+        for kind, _, timed_out in pending:
+            if not timed_out:
+                stats.errors[kind] += 1
+    finally:
+        receiver.cancel()
+        await websocket.close()
+
+
+async def _run_clients(indices: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    stats = _Stats()
+    now = time.perf_counter()
+    ramp = args.ramp_seconds / max(args.total_clients, 1)
+    stop_at = now + args.ramp_seconds + args.duration
+    await asyncio.gather(*(_client(i, args, stats, now + i * ramp, stop_at) for i in indices))
+    return stats.to_dict()
+
+
+def _worker(indices: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    _raise_file_limit()
+    return asyncio.run(_run_clients(indices, args))
+
+
+def _raise_file_limit():
+    """Each client needs a socket; lift the soft descriptor limit to the hard limit"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+            "max": round(float(values.max()), 2), "count": len(samples)}
+
+
+def run_level(clients: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one load level across the configured client processes and summarize it"""
+    args.total_clients = clients
+    processes = max(1, min(args.processes, clients))
+    shards = [list(range(i, clients, processes)) for i in range(processes)]
+
+    started = time.perf_counter()
+    if processes == 1:
+        parts = [_worker(shards[0], args)]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            parts = pool.starmap(_worker, [(shard, args) for shard in shards])
+    elapsed = time.perf_counter() - started
+
+    merged = _Stats().to_dict()
+    for part in parts:
+        merged["connect_latencies"] += part["connect_latencies"]
+        for key in ("connect_failures", "disconnects", "no_speech"):
+            merged[key] += part[key]
+        for key in ("sent", "timeouts", "errors"):
+            for kind in MESSAGE_TYPES:
+                merged[key][kind] += part[key][kind]
+        for kind, samples in part["latencies"].items():
+            merged["latencies"][kind] += samples
+
+    completed = sum(len(merged["latencies"][kind]) for kind in MESSAGE_TYPES)
+    window = args.ramp_seconds + args.duration
+    return {
+        "clients": clients,
+        "elapsed_seconds": round(elapsed, 2),
+        "connections": {
+            "established": len(merged["connect_latencies"]),
+            "failed": merged["connect_failures"],
+            "dropped": merged["disconnects"],
+            "setup_ms": _percentiles(merged["connect_latencies"])
+        },
+        "throughput": {
+            "sent_per_sec": round(sum(merged["sent"].values()) / window, 2),
+            "completed_per_sec": round(completed / window, 2)
+        },
+        "messages": {
+            kind: {
+                "sent": merged["sent"][kind],
+                "completed": len(merged["latencies"][kind]),
+                "timeouts": merged["timeouts"][kind],
+                "errors": merged["errors"][kind],
+                "latency_ms": _percentiles(merged["latencies"][kind])
+            }
+            for kind in MESSAGE_TYPES
+        },
+        "stt_ms": _percentiles(merged["latencies"]["stt"]),
+        "no_speech": merged["no_speech"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Revere voice server WebSocket endpoint")
+    parser.add_argument("--url", default="ws://127.0.0.1:8001/ws")
+    parser.add_argument("--clients", default="100", help="Client count, or comma-separated levels run in turn")
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="Spread connection setup over this long")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic after the ramp")
+    parser.add_argument("--text-rate", type=float, default=0.2, help="text_input messages per second per client")
+    parser.add_argument("--ping-rate", type=float, default=0.5, help="ping messages per second per client")
+    parser.add_argument("--audio-rate", type=float, default=0.05, help="audio frames per second per client")
+    parser.add_argument("--audio-seconds", type=float, default=2.0, help="Length of each audio frame")
+    parser.add_argument("--silence-ratio", type=float, default=0.1, help="Share of audio frames that are silent")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a response counts as timed out")
+    parser.add_argument("--processes", type=int, default=1, help="Client processes (use several for thousands of clients)")
+    parser.add_argument("--pause", type=float, default=5.0, help="Seconds between load levels")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    levels = []
+    for i, clients in enumerate(int(level) for level in args.clients.split(",")):
+        if i:
+            time.sleep(args.pause)
+        print(f"🔌 {clients} clients against {args.url} ...", file=sys.stderr, flush=True)
+        level = run_level(clients, args)
+        levels.append(level)
+        text = level["messages"]["text"]
+        print(f"   {level['connections']['established']} connected, {level['throughput']['completed_per_sec']} responses/s, "
+              f"text p95 {text['latency_ms'].get('p95')} ms, timeouts {sum(m['timeouts'] for m in level['messages'].values())}",
+              file=sys.stderr, flush=True)
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key != "total_clients"}
+        },
+        "levels": levels
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# Near-duplicate detection for the Revere RAG system
+import os
+import re
+import zlib
+import pickle
+import logging
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r'\w+')
+_DIGIT = re.compile(r'\d')
+# Page and section markers ("Page 41", "p. 7 of 12", "Section 3.2") vary across otherwise identical boilerplate
+_MARKER = re.compile(r'\b(page|pg|p|section|sec)\.?\s*\d+(?:\.\d+)*(?:\s+of\s+\d+)?\b', re.IGNORECASE)
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+
+# Bump when shingling changes; persisted signatures from other versions are recomputed
+HASHER_VERSION = 3
+
+
+class MinHasher:
+    """Computes MinHash signatures over word shingles"""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, short_shingle_size: int = 3,
+                 short_text_words: int = 40, seed: int = 1):
+        """
+        Args:
+            num_perm: Number of MinHash permutations
+            shingle_size: Words per shingle
+            short_shingle_size: Words per shingle for texts shorter than short_text_words
+            short_text_words: Word count below which short shingles are used
+            seed: Seed of the permutation coefficients
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.short_shingle_size = short_shingle_size
+        self.short_text_words = short_text_words
+        self.a = rng.randint(1, 2**31 - 1, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2**31 - 1, size=num_perm).astype(np.uint64)
+
+    @staticmethod
+    def words(text: str) -> List[str]:
+        """Lowercased words, with page and section numbers replaced by '#'
+
+        Other numbers are kept: tables that differ only in their figures
+        (FY2024 vs FY2025 amounts) are different documents.
+        """
+        return _WORD.findall(_MARKER.sub(r'\1 #', text).lower())
+
+    def figures(self, text: str) -> int:
+        """Checksum of the numeric tokens in order, outside page and section markers"""
+        numbers = ' '.join(word for word in self.words(text) if _DIGIT.search(word))
+        return zlib.crc32(numbers.encode())
+
+    def shingles(self, text: str) -> Set[str]:
+        """Word n-grams of the normalized text (shorter n-grams for short texts)"""
+        words = self.words(text)
+        size = self.short_shingle_size if len(words) < self.short_text_words else self.shingle_size
+        if len(words) <= size:
+            return {' '.join(words)}
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text"""
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in self.shingles(text)),
+                             dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures for stored documents
+
+    A new document whose estimated Jaccard similarity to a stored one is at
+    least the threshold, and whose figures are the same, is reported as a
+    duplicate of it. Dropped duplicates
+    are kept as back-references to the stored (canonical) document.
+
+    A canonical document whose own source goes away stays stored ("retained")
+    for as long as back-references point to it, so the dropped duplicates
+    remain searchable.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9,
+                 num_perm: int = 64, bands: int = 16):
+        """
+        Args:
+            path: Pickle file used to persist the index (None keeps it in memory)
+            threshold: Minimum estimated Jaccard similarity to count as a duplicate
+            num_perm: Number of MinHash permutations
+            bands: Number of LSH bands (must divide num_perm)
+        """
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.figures: Dict[str, int] = {}  # doc id -> checksum of its numbers
+        self.references: Dict[str, str] = {}  # duplicate id -> canonical id
+        self.retained: Set[str] = set()  # canonical ids kept only for their duplicates
+        self.stale = False  # signatures were computed by another hasher version
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._load()
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as file:
+                data = pickle.load(file)
+            self.references = data['references']
+            self.retained = set(data.get('retained', ()))
+            if data.get('version') != HASHER_VERSION:
+                self.stale = True
+                logger.warning("Near-duplicate signatures are from an older version and will be recomputed")
+                return
+            for doc_id, signature in data['signatures'].items():
+                self._insert(doc_id, signature, data['figures'][doc_id])
+        except Exception as e:
+            logger.error(f"Failed to load near-duplicate index, starting fresh: {e}")
+            self.signatures = {}
+            self.figures = {}
+            self.references = {}
+            self.retained = set()
+            self._buckets = [{} for _ in range(self.bands)]
+
+    def save(self):
+        """Persist signatures and back-references"""
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'version': HASHER_VERSION, 'signatures': self.signatures, 'figures': self.figures,
+                         'references': self.references, 'retained': self.retained}, file)
+        os.replace(tmp_path, self.path)
+
+    def reindex(self, documents):
+        """
+        Recompute signatures of stored documents (after a hasher change)
+
+        Args:
+            documents: Iterable of (doc_id, content) pairs
+        """
+        self.signatures = {}
+        self.figures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        for doc_id, content in documents:
+            self._insert(doc_id, self.hasher.signature(content), self.hasher.figures(content))
+        self.stale = False
+
+    def _insert(self, doc_id: str, signature: np.ndarray, figures: int):
+        self.signatures[doc_id] = signature
+        self.figures[doc_id] = figures
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(doc_id)
+
+    def find_duplicate(self, signature: np.ndarray, figures: Optional[int] = None) -> Optional[str]:
+        """Return the ID of a stored near-duplicate of the signature (with the same figures, if given)"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_score = None, self.threshold
+        for candidate in candidates:
+            if figures is not None and self.figures.get(candidate) != figures:
+                continue
+            score = float(np.mean(self.signatures[candidate] == signature))
+            if score >= best_score:
+                best_id, best_score = candidate, score
+        return best_id
+
+    def add(self, doc_id: str, content: str) -> Optional[str]:
+        """
+        Register a document, unless it duplicates one already stored
+
+        Args:
+            doc_id: ID the document would be stored under
+            content: Document content
+
+        Returns:
+            Canonical document ID if the content is a near-duplicate, else None
+        """
+        signature = self.hasher.signature(content)
+        figures = self.hasher.figures(content)
+        canonical = self.find_duplicate(signature, figures)
+        if canonical is not None:
+            if canonical != doc_id:
+                self.references[doc_id] = canonical
+            else:
+                # Its own source is back, so it is no longer kept only for duplicates
+                self.retained.discard(doc_id)
+            return canonical
+
+        self._insert(doc_id, signature, figures)
+        return None
+
+    def _forget(self, doc_id: str):
+        signature = self.signatures.pop(doc_id, None)
+        self.figures.pop(doc_id, None)
+        self.retained.discard(doc_id)
+        if signature is None:
+            return
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def remove(self, doc_ids: List[str], keep_referenced: bool = True) -> List[str]:
+        """
+        Forget documents whose source no longer contains them
+
+        Args:
+            doc_ids: IDs being removed (canonical documents or dropped duplicates)
+            keep_referenced: Retain canonical documents that still have
+                back-references instead of forgetting them and their duplicates
+
+        Returns:
+            IDs that can be deleted from the vector store; retained canonical
+            documents are left out, and retained ones whose last duplicate
+            went away are added
+        """
+        doomed = set(doc_ids)
+        released = set()
+        for doc_id in doomed:
+            canonical = self.references.pop(doc_id, None)
+            if canonical is not None:
+                released.add(canonical)
+
+        referenced = set(self.references.values())
+        deletable = []
+        for doc_id in doomed:
+            if doc_id in self.signatures and keep_referenced and doc_id in referenced:
+                self.retained.add(doc_id)
+                continue
+            self._forget(doc_id)
+            deletable.append(doc_id)
+
+        if not keep_referenced:
+            self.references = {dup: canonical for dup, canonical in self.references.items()
+                               if canonical not in doomed}
+
+        # Retained documents go once nothing refers to them any more
+        for canonical in released - doomed:
+            if canonical in self.retained and canonical not in referenced:
+                self._forget(canonical)
+                deletable.append(canonical)
+        return deletable
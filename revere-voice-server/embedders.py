@@ -0,0 +1,444 @@
+# Embedding backends for the Revere RAG system
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import logging
+import argparse
+import importlib.util
+from typing import List, Union, Tuple, Dict, Optional, Any
+
+import numpy as np
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Model runtimes are heavy to import, so only their presence is checked here
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+if not SENTENCE_TRANSFORMERS_AVAILABLE:
+    print("SentenceTransformers not available. Install with: pip install sentence-transformers")
+
+ONNX_AVAILABLE = (importlib.util.find_spec("onnxruntime") is not None
+                  and importlib.util.find_spec("tokenizers") is not None)
+
+# Model names served by the Gemini embedding API (used by the frontend pipeline)
+GEMINI_EMBEDDING_MODELS = {"text-embedding-004"}
+
+_TOKEN = re.compile(r'\w+')
+
+
+class EmbeddingBackend:
+    """
+    Interface shared by all embedding backends
+
+    Backends follow SentenceTransformer's encode() calling convention so the
+    RAG system can treat them interchangeably.
+    """
+
+    # Whether vectors are worth keeping in the on-disk embedding cache
+    cacheable = True
+    dim: int = 0
+    # Settings that change the vectors beyond the model name (file variant, token limit)
+    variant: str = ""
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Embed one text (returns a vector) or a list of texts (returns a matrix)"""
+        raise NotImplementedError
+
+
+def is_hashing_model(model_name: str) -> bool:
+    """Whether a model name selects the feature-hashing embedder ("hashing" or "hashing-<dim>")"""
+    return model_name == "hashing" or model_name.startswith("hashing-")
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """
+    Deterministic feature-hashing embedder
+
+    Word unigrams/bigrams and character n-grams of each word are hashed with
+    CRC32 into a fixed number of signed buckets, weighted by log term
+    frequency and L2-normalized. Vectors are identical across processes and
+    machines (no PYTHONHASHSEED or RNG state involved) and carry lexical
+    similarity, so retrieval works without any model download.
+    """
+
+    # Cheap enough to recompute; not worth an on-disk cache entry
+    cacheable = False
+
+    def __init__(self, dim: int = 384, char_ngrams: Tuple[int, int] = (3, 5), word_bigrams: bool = True):
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+        self.word_bigrams = word_bigrams
+        self._word_features: Dict[str, Tuple[List[int], List[float]]] = {}
+
+    @classmethod
+    def from_model_name(cls, model_name: str) -> "HashingEmbedder":
+        """Build from "hashing" or "hashing-<dim>" """
+        _, _, dim = model_name.partition("-")
+        return cls(dim=int(dim)) if dim else cls()
+
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        value = zlib.crc32(feature.encode())
+        return value % self.dim, (1.0 if value & 0x80000000 else -1.0)
+
+    def _features_for_word(self, word: str) -> Tuple[List[int], List[float]]:
+        """Hashed unigram and character n-gram features of one word (memoized)"""
+        cached = self._word_features.get(word)
+        if cached is not None:
+            return cached
+
+        indices, signs = [], []
+        index, sign = self._hash(f"w:{word}")
+        indices.append(index)
+        signs.append(sign)
+
+        padded = f"<{word}>"
+        low, high = self.char_ngrams
+        ngrams = [padded[i:i + n] for n in range(low, high + 1) for i in range(len(padded) - n + 1)]
+        for ngram in ngrams:
+            index, sign = self._hash(f"c:{ngram}")
+            indices.append(index)
+            # Character n-grams together weigh as much as the word itself
+            signs.append(sign / len(ngrams))
+
+        if len(self._word_features) < 200000:
+            self._word_features[word] = (indices, signs)
+        return indices, signs
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Embed one text or a list of texts"""
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+
+        rows, indices, weights = [], [], []
+        for row, text in enumerate(batch):
+            words = _TOKEN.findall(text.lower())
+            for word in words:
+                word_indices, word_signs = self._features_for_word(word)
+                indices.extend(word_indices)
+                weights.extend(word_signs)
+                rows.extend([row] * len(word_indices))
+            if self.word_bigrams:
+                for first, second in zip(words, words[1:]):
+                    index, sign = self._hash(f"b:{first} {second}")
+                    indices.append(index)
+                    weights.append(sign)
+                    rows.append(row)
+
+        flat = np.asarray(rows, dtype=np.int64) * self.dim + np.asarray(indices, dtype=np.int64)
+        matrix = np.bincount(flat, weights=np.asarray(weights, dtype=np.float64),
+                             minlength=len(batch) * self.dim).reshape(len(batch), self.dim)
+
+        # Sublinear term frequency, then unit length
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+        return matrix[0] if single else matrix
+
+
+def is_gemini_model(model_name: str) -> bool:
+    """Whether a model name refers to a Gemini embedding model"""
+    return model_name in GEMINI_EMBEDDING_MODELS or model_name.startswith("models/")
+
+
+class GeminiEmbedder(EmbeddingBackend):
+    """
+    Embeds text with the Gemini embedding REST API
+
+    Mirrors the SentenceTransformer encode() interface, so collections holding
+    vectors produced by the frontend (768-dim text-embedding-004) can be
+    queried with matching query embeddings.
+    """
+
+    API_URL = "https://generativelanguage.googleapis.com/v1beta/{model}:batchEmbedContents"
+    MAX_BATCH = 100
+
+    def __init__(self, model_name: str = "text-embedding-004", api_key: str = None, timeout: int = 30):
+        self.model = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.dim = 768
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("VITE_GEMINI_API_KEY")
+        self.timeout = timeout
+        if not self.api_key:
+            raise ValueError("GEMINI_API_KEY is not set")
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        """Embed one text or a list of texts"""
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+
+        vectors = []
+        for start in range(0, len(batch), self.MAX_BATCH):
+            response = requests.post(
+                self.API_URL.format(model=self.model),
+                params={"key": self.api_key},
+                json={"requests": [
+                    {"model": self.model, "content": {"parts": [{"text": text}]}}
+                    for text in batch[start:start + self.MAX_BATCH]
+                ]},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            vectors.extend(item["values"] for item in response.json()["embeddings"])
+
+        result = np.asarray(vectors, dtype=np.float32)
+        return result[0] if single else result
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision PyTorch sentence-transformers model"""
+
+    def __init__(self, model_name: str, intra_op_threads: Optional[int] = None,
+                 max_seq_length: Optional[int] = None):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ImportError("sentence-transformers is not installed")
+        from sentence_transformers import SentenceTransformer
+
+        if intra_op_threads:
+            import torch
+            torch.set_num_threads(intra_op_threads)
+
+        self.model = SentenceTransformer(model_name)
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.variant = f"seq{self.model.max_seq_length}"
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, **kwargs)
+
+
+class OnnxEmbedder(EmbeddingBackend):
+    """
+    ONNX Runtime embedder for exported (optionally int8-quantized) models
+
+    Loads model_int8.onnx (or model.onnx) and tokenizer.json from a local
+    directory produced by export_onnx_model(), and applies the same mean
+    pooling and normalization as the sentence-transformers MiniLM models.
+    Needs only onnxruntime and tokenizers at runtime, not PyTorch.
+    """
+
+    def __init__(self, model_dir: str, intra_op_threads: Optional[int] = None,
+                 max_seq_length: int = 256, batch_size: int = 32):
+        """
+        Args:
+            model_dir: Directory containing the exported model and tokenizer
+            intra_op_threads: ONNX Runtime intra-op thread count (default: all cores)
+            max_seq_length: Token limit per text
+            batch_size: Texts per inference call
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("ONNX embeddings require onnxruntime and tokenizers. "
+                              "Install with: pip install onnxruntime tokenizers")
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, "model.onnx")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+        self.dim = int(self.session.get_outputs()[0].shape[-1])
+        self.variant = f"{os.path.splitext(os.path.basename(model_path))[0]}-seq{max_seq_length}"
+        logger.info(f"✅ Loaded ONNX embedding model: {model_path}")
+
+    def encode(self, texts: Union[str, List[str]], convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+
+        outputs = []
+        for start in range(0, len(batch), self.batch_size):
+            encodings = self.tokenizer.encode_batch(batch[start:start + self.batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then unit length
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            outputs.append(pooled.astype(np.float32))
+
+        matrix = np.concatenate(outputs) if outputs else np.zeros((0, self.dim), dtype=np.float32)
+        return matrix[0] if single else matrix
+
+
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """
+    Export a sentence-transformers model to ONNX, optionally int8-quantized
+
+    Run once on a machine with PyTorch and transformers installed; the
+    resulting directory is all OnnxEmbedder needs.
+
+    Args:
+        model_name: Hugging Face model (bare names resolve under sentence-transformers/)
+        output_dir: Directory to write model.onnx, model_int8.onnx and tokenizer files
+        quantize: Whether to also write a dynamically int8-quantized model
+
+    Returns:
+        Path of the model OnnxEmbedder will load
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["Revere Beach is America's first public beach"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+
+    if not quantize:
+        return model_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantized_path = os.path.join(output_dir, "model_int8.onnx")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"📦 Exported quantized ONNX model to {quantized_path}")
+    return quantized_path
+
+
+def create_embedding_backend(model_name: str, intra_op_threads: Optional[int] = None,
+                             max_seq_length: Optional[int] = None) -> EmbeddingBackend:
+    """
+    Build the embedding backend selected by a model name
+
+    "hashing"/"hashing-<dim>" selects HashingEmbedder, Gemini model names
+    select GeminiEmbedder, "onnx:<directory>" selects OnnxEmbedder, and
+    anything else is loaded with sentence-transformers.
+    """
+    if is_hashing_model(model_name):
+        return HashingEmbedder.from_model_name(model_name)
+    if is_gemini_model(model_name):
+        return GeminiEmbedder(model_name)
+    if model_name.startswith("onnx:"):
+        return OnnxEmbedder(model_name[len("onnx:"):], intra_op_threads=intra_op_threads,
+                            max_seq_length=max_seq_length or 256)
+    return SentenceTransformerBackend(model_name, intra_op_threads=intra_op_threads,
+                                      max_seq_length=max_seq_length)
+
+
+def compare_backends(reference: EmbeddingBackend, candidate: EmbeddingBackend,
+                     texts: List[str], queries: List[str], k: int = 5) -> Dict[str, Any]:
+    """
+    Compare a candidate backend against a reference on the same corpus
+
+    Args:
+        reference: Backend currently in use
+        candidate: Backend being evaluated
+        texts: Corpus to embed and search
+        queries: Queries to retrieve with
+        k: Number of results compared per query
+
+    Returns:
+        Encode throughput of each backend, top-k retrieval agreement
+        (mean overlap of the candidate's top-k with the reference's), and
+        mean cosine similarity of paired vectors when dimensions match
+    """
+    report: Dict[str, Any] = {'texts': len(texts), 'queries': len(queries), 'k': k}
+    matrices = {}
+
+    for label, backend in (('reference', reference), ('candidate', candidate)):
+        started = time.perf_counter()
+        corpus = np.asarray(backend.encode(texts), dtype=np.float32)
+        elapsed = time.perf_counter() - started
+        query_matrix = np.asarray(backend.encode(queries), dtype=np.float32)
+
+        corpus /= np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        query_matrix /= np.maximum(np.linalg.norm(query_matrix, axis=1, keepdims=True), 1e-12)
+        matrices[label] = corpus
+        report[f'{label}_texts_per_sec'] = round(len(texts) / elapsed, 1) if elapsed else None
+
+        scores = query_matrix @ corpus.T
+        report[f'_{label}_top'] = np.argsort(-scores, axis=1)[:, :k]
+
+    reference_top = report.pop('_reference_top')
+    candidate_top = report.pop('_candidate_top')
+    overlaps = [len(set(ref) & set(cand)) / k for ref, cand in zip(reference_top, candidate_top)]
+    report['topk_agreement'] = round(float(np.mean(overlaps)), 4) if overlaps else None
+    report['top1_agreement'] = round(float(np.mean(reference_top[:, 0] == candidate_top[:, 0])), 4) if overlaps else None
+
+    if matrices['reference'].shape == matrices['candidate'].shape:
+        paired = np.sum(matrices['reference'] * matrices['candidate'], axis=1)
+        report['mean_cosine'] = round(float(np.mean(paired)), 4)
+
+    if report['reference_texts_per_sec'] and report['candidate_texts_per_sec']:
+        report['speedup'] = round(report['candidate_texts_per_sec'] / report['reference_texts_per_sec'], 2)
+    return report
+
+
+if __name__ == "__main__":
+    from ingestion import chunk_text
+
+    parser = argparse.ArgumentParser(description="Export and compare embedding backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export-onnx", help="Export a model to (quantized) ONNX")
+    export_parser.add_argument("model", help="e.g. all-MiniLM-L6-v2")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--no-quantize", action="store_true")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare throughput and retrieval agreement")
+    compare_parser.add_argument("--reference", default="all-MiniLM-L6-v2")
+    compare_parser.add_argument("--candidate", required=True, help="e.g. onnx:./models/minilm-int8 or hashing")
+    compare_parser.add_argument("--corpus", default=os.path.join(os.path.dirname(__file__), "..", "public", "FY2025-Budget.md"))
+    compare_parser.add_argument("--max-texts", type=int, default=1000)
+    compare_parser.add_argument("--queries", type=int, default=100)
+    compare_parser.add_argument("--threads", type=int, default=None)
+    compare_parser.add_argument("--max-seq-length", type=int, default=None)
+    compare_parser.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args()
+    if args.command == "export-onnx":
+        print(export_onnx_model(args.model, args.output_dir, quantize=not args.no_quantize))
+        sys.exit(0)
+
+    with open(args.corpus, 'r', encoding='utf-8') as file:
+        corpus_texts = [chunk for _, chunk in chunk_text(file.read())][:args.max_texts]
+
+    # Queries are the opening words of evenly spaced chunks
+    step = max(1, len(corpus_texts) // args.queries)
+    query_texts = [' '.join(chunk.split()[:12]) for chunk in corpus_texts[::step]][:args.queries]
+
+    result = compare_backends(
+        create_embedding_backend(args.reference, args.threads, args.max_seq_length),
+        create_embedding_backend(args.candidate, args.threads, args.max_seq_length),
+        corpus_texts, query_texts, k=args.k
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,212 @@
+# On-disk embedding cache for the Revere RAG system
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_KEY_BYTES = 16  # Raw MD5 digest
+
+
+class EmbeddingCache:
+    """
+    Persistent cache of embedding vectors keyed by (model name, md5(content))
+
+    Each model gets a pair of append-only files: a float32 vector matrix that
+    is memory-mapped for reads, and a parallel array of raw MD5 digests that
+    is loaded into a hash index at startup. When the vector file grows past
+    max_bytes the least recently used rows are compacted away.
+    """
+
+    def __init__(self, directory: str, model_name: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Open (or create) the cache for one embedding model
+
+        Args:
+            directory: Directory holding the cache files
+            model_name: Embedding model the vectors were produced by
+            max_bytes: Size budget for the vector file before eviction
+        """
+        self.directory = directory
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.vectors_path = os.path.join(directory, f"{safe_name}.vectors.f32")
+        self.keys_path = os.path.join(directory, f"{safe_name}.keys.bin")
+        self.dim_path = os.path.join(directory, f"{safe_name}.dim")
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._last_used: Optional[np.ndarray] = None
+        self._tick = 0
+        self._vectors: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key_for(content: str) -> bytes:
+        """Cache key for a piece of content"""
+        return hashlib.md5(content.encode()).digest()
+
+    def _load(self):
+        if not os.path.exists(self.dim_path):
+            return
+
+        try:
+            with open(self.dim_path, 'r') as file:
+                self.dim = int(file.read().strip())
+
+            row_bytes = self.dim * 4
+            vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+            key_rows = os.path.getsize(self.keys_path) // _KEY_BYTES if os.path.exists(self.keys_path) else 0
+            rows = min(vector_rows, key_rows)
+
+            # Drop a partially written tail left by an interrupted append
+            if vector_rows != rows or key_rows != rows:
+                self._truncate(rows)
+
+            if rows:
+                keys = np.fromfile(self.keys_path, dtype=np.uint8).reshape(rows, _KEY_BYTES)
+                self._index = {keys[row].tobytes(): row for row in range(rows)}
+            self._last_used = np.arange(rows, dtype=np.int64)
+            self._tick = rows
+
+            logger.info(f"💾 Embedding cache loaded: {rows} vectors for {self.model_name}")
+        except Exception as e:
+            logger.error(f"Failed to load embedding cache, starting fresh: {e}")
+            self._reset()
+
+    def _reset(self):
+        for path in (self.vectors_path, self.keys_path, self.dim_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._index = {}
+        self._last_used = None
+        self._vectors = None
+        self._tick = 0
+        self.dim = None
+
+    def _truncate(self, rows: int):
+        with open(self.vectors_path, 'ab') as file:
+            file.truncate(rows * self.dim * 4)
+        with open(self.keys_path, 'ab') as file:
+            file.truncate(rows * _KEY_BYTES)
+
+    def _mapped_vectors(self) -> np.memmap:
+        rows = len(self._index)
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                      shape=(rows, self.dim))
+        return self._vectors
+
+    def get_many(self, contents: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings
+
+        Args:
+            contents: Texts to look up
+
+        Returns:
+            Cached vector per text, or None where the text is not cached
+        """
+        results: List[Optional[List[float]]] = [None] * len(contents)
+        with self._lock:
+            if not self._index:
+                self.misses += len(contents)
+                return results
+
+            vectors = self._mapped_vectors()
+            for i, content in enumerate(contents):
+                row = self._index.get(self.key_for(content))
+                if row is None:
+                    self.misses += 1
+                    continue
+                results[i] = vectors[row].tolist()
+                self._last_used[row] = self._tick
+                self._tick += 1
+                self.hits += 1
+
+        return results
+
+    def put_many(self, contents: List[str], embeddings: List[List[float]]):
+        """
+        Store embeddings for texts that are not cached yet
+
+        Args:
+            contents: Texts that were embedded
+            embeddings: Their embedding vectors
+        """
+        if not contents:
+            return
+
+        with self._lock:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                with open(self.dim_path, 'w') as file:
+                    file.write(str(self.dim))
+            elif matrix.shape[1] != self.dim:
+                logger.warning(f"Embedding cache dimension mismatch ({matrix.shape[1]} != {self.dim}), skipping")
+                return
+
+            new_keys, new_rows = [], []
+            for content, vector in zip(contents, matrix):
+                key = self.key_for(content)
+                if key in self._index:
+                    continue
+                self._index[key] = len(self._index)
+                new_keys.append(key)
+                new_rows.append(vector)
+
+            if not new_keys:
+                return
+
+            with open(self.vectors_path, 'ab') as file:
+                file.write(np.stack(new_rows).tobytes())
+            with open(self.keys_path, 'ab') as file:
+                file.write(b''.join(new_keys))
+
+            ticks = np.arange(self._tick, self._tick + len(new_keys), dtype=np.int64)
+            self._tick += len(new_keys)
+            self._last_used = ticks if self._last_used is None else np.concatenate([self._last_used, ticks])
+
+            if len(self._index) * self.dim * 4 > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Compact the cache down to 80% of its budget, keeping recently used rows"""
+        keep_rows = int(self.max_bytes * 0.8) // (self.dim * 4)
+        keep = np.sort(np.argsort(self._last_used)[-keep_rows:]) if keep_rows > 0 else np.array([], dtype=np.int64)
+
+        vectors = np.array(self._mapped_vectors()[keep])
+        keys = np.fromfile(self.keys_path, dtype=np.uint8).reshape(-1, _KEY_BYTES)[keep]
+        evicted = len(self._index) - len(keep)
+
+        self._vectors = None
+        for path, data in ((self.vectors_path, vectors), (self.keys_path, keys)):
+            tmp_path = f"{path}.tmp"
+            data.tofile(tmp_path)
+            os.replace(tmp_path, path)
+
+        self._index = {keys[row].tobytes(): row for row in range(len(keep))}
+        self._last_used = self._last_used[keep]
+        logger.info(f"🧹 Evicted {evicted} vectors from embedding cache")
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Size and hit-rate counters for the cache"""
+        return {
+            'entries': len(self._index),
+            'bytes': len(self._index) * (self.dim or 0) * 4,
+            'hits': self.hits,
+            'misses': self.misses
+        }
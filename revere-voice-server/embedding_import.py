@@ -0,0 +1,209 @@
+# Bulk import of precomputed embeddings into the Revere RAG system
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib.util
+from typing import Iterator, Dict, Any, Optional, List
+
+from rag_system import RevereRAGSystem, CHROMADB_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def _detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    if extension == '.parquet':
+        return 'parquet'
+    raise ValueError(f"Cannot infer export format from {path}, pass one explicitly")
+
+
+def iter_export_rows(path: str, fmt: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream rows of a budget_chunks style export
+
+    Rows carry id, content, metadata (object or JSON text) and embedding
+    (list or pgvector/JSON text such as "[0.1,0.2,...]").
+
+    Args:
+        path: Export file
+        fmt: 'jsonl', 'csv' or 'parquet' (inferred from the extension if omitted)
+        batch_size: Rows read at a time from Parquet files
+
+    Yields:
+        One dictionary per row
+    """
+    fmt = fmt or _detect_format(path)
+
+    if fmt == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == 'csv':
+        csv.field_size_limit(sys.maxsize)
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            yield from csv.DictReader(file)
+    elif fmt == 'parquet':
+        if not PARQUET_AVAILABLE:
+            raise ImportError("Parquet import requires pyarrow. Install with: pip install pyarrow")
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def _parse_embedding(value: Any) -> List[float]:
+    if isinstance(value, str):
+        value = json.loads(value)
+    return [float(x) for x in value]
+
+
+def _flatten_metadata(value: Any) -> Dict[str, Any]:
+    """Vector store metadata must be flat scalars; nested values become JSON text"""
+    if isinstance(value, str):
+        value = json.loads(value) if value.strip() else {}
+    metadata = {}
+    for key, item in (value or {}).items():
+        if item is None:
+            continue
+        metadata[key] = item if isinstance(item, (str, int, float, bool)) else json.dumps(item)
+    return metadata
+
+
+def import_embeddings(path: str,
+                      fmt: Optional[str] = None,
+                      collection_name: str = "budget_chunks",
+                      persist_directory: str = "./revere_rag_db",
+                      embedding_model: str = "text-embedding-004",
+                      source: str = "budget_chunks",
+                      batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Load a precomputed embedding export into a dimension-specific collection
+
+    The target collection is "<collection_name>_d<dimension>" and records
+    embedding_model in its metadata, so RevereRAGSystem embeds queries
+    against it with the same model. No model inference happens here, and
+    ChromaDB is required since the in-memory store would not persist.
+
+    Args:
+        path: Export file (JSONL, CSV or Parquet)
+        fmt: Export format (inferred from the extension if omitted)
+        collection_name: Base name of the target collection
+        persist_directory: Directory holding the vector database
+        embedding_model: Model that produced the vectors
+        source: Source name stored on every imported document
+        batch_size: Rows written per vector store call
+
+    Returns:
+        Import statistics
+    """
+    if not CHROMADB_AVAILABLE:
+        raise ImportError("Embedding import requires ChromaDB. Install with: pip install chromadb")
+
+    started = time.time()
+    rag = None
+    dimension = None
+    imported = skipped = 0
+    ids, contents, metadatas, embeddings = [], [], [], []
+
+    def flush():
+        rag.add_precomputed(ids, contents, metadatas, embeddings)
+        ids.clear()
+        contents.clear()
+        metadatas.clear()
+        embeddings.clear()
+
+    for row in iter_export_rows(path, fmt):
+        content = row.get('content')
+        embedding = row.get('embedding')
+        if not content or embedding in (None, ''):
+            skipped += 1
+            continue
+
+        vector = _parse_embedding(embedding)
+        if rag is None:
+            dimension = len(vector)
+            rag = RevereRAGSystem(
+                collection_name=f"{collection_name}_d{dimension}",
+                persist_directory=persist_directory,
+                embedding_model=embedding_model,
+                embedding_cache_mb=0,
+                near_duplicate_threshold=None,
+                seed_knowledge_base=False,
+                load_embedding_model=False
+            )
+            if rag.collection is None:
+                raise RuntimeError(f"Could not open collection {rag.collection_name} in {persist_directory}")
+        elif len(vector) != dimension:
+            logger.warning(f"Skipping row {row.get('id')}: {len(vector)}-dim embedding in a {dimension}-dim import")
+            skipped += 1
+            continue
+
+        metadata = _flatten_metadata(row.get('metadata'))
+        metadata.setdefault('source', source)
+        metadata['char_count'] = len(content)
+        if row.get('id') not in (None, ''):
+            metadata['source_row_id'] = str(row['id'])
+            doc_id = f"{source}:{row['id']}"
+        else:
+            doc_id = rag._generate_doc_id(content)
+
+        ids.append(doc_id)
+        contents.append(content)
+        metadatas.append(metadata)
+        embeddings.append(vector)
+        imported += 1
+
+        if len(ids) >= batch_size:
+            flush()
+
+    if rag is not None and ids:
+        flush()
+
+    elapsed = time.time() - started
+    stats = {
+        'collection': rag.collection_name if rag else None,
+        'dimension': dimension,
+        'embedding_model': embedding_model,
+        'imported': imported,
+        'skipped': skipped,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(imported / elapsed, 1) if elapsed else 0.0
+    }
+    logger.info(f"📦 Imported {imported} precomputed embeddings into {stats['collection']} "
+                f"({stats['rows_per_sec']} rows/sec)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import precomputed embeddings (e.g. a Supabase budget_chunks export)")
+    parser.add_argument("path", help="JSONL, CSV or Parquet export")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"], default=None)
+    parser.add_argument("--collection", default="budget_chunks")
+    parser.add_argument("--persist-directory", default="./revere_rag_db")
+    parser.add_argument("--embedding-model", default="text-embedding-004")
+    parser.add_argument("--source", default="budget_chunks")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    result = import_embeddings(
+        args.path,
+        fmt=args.format,
+        collection_name=args.collection,
+        persist_directory=args.persist_directory,
+        embedding_model=args.embedding_model,
+        source=args.source,
+        batch_size=args.batch_size
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,293 @@
+# Blue/green index versions for the Revere RAG system
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable
+
+from rag_system import RevereRAGSystem
+from ingest_jobs import _lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+# Unless told otherwise, a rebuilt version must hold at least this share of the active one's ingested chunks
+MIN_DOCUMENT_RATIO = 0.5
+
+
+class IndexVersionManager:
+    """
+    Serves queries from one RevereRAGSystem while rebuilding another
+
+    Each rebuild ingests into a fresh collection named
+    "<collection_name>__v<N>", validates it, and then replaces the active
+    instance with a single reference assignment. The previous version stays
+    on disk for rollback; older ones are dropped. The active version is
+    recorded in a pointer file so restarts pick it up.
+
+    Ingestion into the active version goes through ingestion(), which waits
+    while a rebuild runs so no upload is written to a version about to be
+    replaced.
+    """
+
+    def __init__(self,
+                 collection_name: str = "revere_documents",
+                 persist_directory: str = "./revere_rag_db",
+                 **rag_kwargs):
+        """
+        Args:
+            collection_name: Base name of the collection
+            persist_directory: Directory holding the vector database
+            rag_kwargs: Extra arguments for every RevereRAGSystem version
+        """
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.rag_kwargs = rag_kwargs
+        self.pointer_path = os.path.join(persist_directory, f"{collection_name}.versions.json")
+
+        self._swap_lock = threading.Lock()
+        # Called with the new active version after every swap or rollback
+        self.on_swap: Optional[Callable[[RevereRAGSystem], None]] = None
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self.rebuild_status: Dict[str, Any] = {"state": "idle"}
+        self._ingest_gate = threading.Condition()
+        self._rebuilding = False
+        self._ingesting = 0
+
+        pointer = self._read_pointer()
+        self.version = pointer.get("version", 0)
+        self.previous_name: Optional[str] = pointer.get("previous")
+        self.active = RevereRAGSystem(
+            collection_name=pointer.get("active", collection_name),
+            persist_directory=persist_directory,
+            **rag_kwargs
+        )
+        self._previous: Optional[RevereRAGSystem] = None
+
+    def _read_pointer(self) -> Dict[str, Any]:
+        if not os.path.exists(self.pointer_path):
+            return {}
+        try:
+            with open(self.pointer_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except Exception as e:
+            logger.error(f"Failed to read index pointer, using base collection: {e}")
+            return {}
+
+    def _write_pointer(self):
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp_path = f"{self.pointer_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                "active": self.active.collection_name,
+                "previous": self.previous_name,
+                "version": self.version
+            }, file)
+        os.replace(tmp_path, self.pointer_path)
+
+    @contextmanager
+    def ingestion(self):
+        """
+        Hold the active version for an ingestion job
+
+        Waits until no rebuild is running, and keeps rebuilds from starting
+        until the block exits.
+
+        Yields:
+            The active RAG system
+        """
+        with self._ingest_gate:
+            self._ingest_gate.wait_for(lambda: not self._rebuilding)
+            self._ingesting += 1
+        try:
+            yield self.active
+        finally:
+            with self._ingest_gate:
+                self._ingesting -= 1
+                self._ingest_gate.notify_all()
+
+    @contextmanager
+    def _block_ingestion(self):
+        with self._ingest_gate:
+            self._rebuilding = True
+            # Jobs already writing to the active version finish first
+            self._ingest_gate.wait_for(lambda: self._ingesting == 0)
+        try:
+            yield
+        finally:
+            with self._ingest_gate:
+                self._rebuilding = False
+                self._ingest_gate.notify_all()
+
+    def validate(self, candidate: RevereRAGSystem, validation_queries: Optional[List[str]] = None,
+                 min_documents: int = 1) -> List[str]:
+        """
+        Check a freshly built version before it goes live
+
+        Args:
+            candidate: Newly built RAG system
+            validation_queries: Queries that must each return at least one result
+            min_documents: Minimum number of chunks ingested from source files
+                (the built-in seed documents do not count)
+
+        Returns:
+            List of problems found (empty if the version is usable)
+        """
+        problems = []
+        total = candidate.manifest.chunk_count()
+        if total < min_documents:
+            problems.append(f"only {total} chunks ingested, expected at least {min_documents}")
+
+        for query in validation_queries or []:
+            if not candidate.search_handles(query, k=1):
+                problems.append(f"no results for validation query: {query}")
+
+        return problems
+
+    def rebuild(self, paths: List[str],
+                embedding_model: Optional[str] = None,
+                max_chunk_chars: int = 1200,
+                validation_queries: Optional[List[str]] = None,
+                min_documents: Optional[int] = None,
+                progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Build a new index version from source files and switch to it if valid
+
+        Ingestion jobs wait while the rebuild runs and then write to
+        whichever version is active.
+
+        Args:
+            paths: PDF, text or markdown files to ingest
+            embedding_model: Embedding model for the new version (defaults to the current one)
+            max_chunk_chars: Chunk size for text files
+            validation_queries: Queries that must return results before switching
+            min_documents: Minimum number of ingested chunks before switching
+                (defaults to MIN_DOCUMENT_RATIO of the active version's count)
+            progress: Optional callback receiving progress counters
+
+        Returns:
+            Summary of the rebuild, including whether the swap happened
+        """
+        with self._block_ingestion():
+            return self._rebuild(paths, embedding_model, max_chunk_chars, validation_queries,
+                                 min_documents, progress)
+
+    def _rebuild(self, paths, embedding_model, max_chunk_chars, validation_queries,
+                 min_documents, progress) -> Dict[str, Any]:
+        started = time.time()
+        version = self.version + 1
+        name = f"{self.collection_name}__v{version}"
+        current = self.active
+
+        rag_kwargs = dict(self.rag_kwargs)
+        rag_kwargs['embedding_model'] = embedding_model or current.embedding_model_name
+        # Seeded like the live index; validation only counts chunks ingested from files
+        if min_documents is None:
+            min_documents = max(1, int(current.manifest.chunk_count() * MIN_DOCUMENT_RATIO))
+        candidate = RevereRAGSystem(
+            collection_name=name,
+            persist_directory=self.persist_directory,
+            embedding_source=current,
+            **rag_kwargs
+        )
+
+        # The name may have been used by an abandoned attempt
+        if candidate.manifest.sources:
+            candidate.drop_index()
+            candidate = RevereRAGSystem(collection_name=name, persist_directory=self.persist_directory,
+                                        embedding_source=current, **rag_kwargs)
+
+        problems = []
+        for i, path in enumerate(paths, 1):
+            if path.lower().endswith('.pdf'):
+                doc_ids = candidate.add_pdf(path, progress=progress)
+            else:
+                doc_ids = candidate.add_text_file(path, max_chunk_chars=max_chunk_chars, progress=progress)
+            if not doc_ids:
+                problems.append(f"no documents indexed from {path}")
+            if progress:
+                progress({'files_done': i, 'files_total': len(paths)})
+
+        problems += self.validate(candidate, validation_queries, min_documents)
+        if problems:
+            logger.error(f"Rebuilt index {name} failed validation: {'; '.join(problems)}")
+            candidate.drop_index()
+            return {"swapped": False, "collection": name, "problems": problems,
+                    "seconds": round(time.time() - started, 3)}
+
+        with self._swap_lock:
+            retired = self._previous
+            retired_name = self.previous_name
+            self._previous = current
+            self.previous_name = current.collection_name
+            self.version = version
+            self.active = candidate
+            self._write_pointer()
+
+        # Only one previous version is kept for rollback
+        if retired_name and retired_name != candidate.collection_name:
+            (retired or self._open(retired_name)).drop_index()
+
+        logger.info(f"🔀 Switched to index {name} ({candidate.get_statistics()['total_documents']} documents)")
+        if self.on_swap:
+            self.on_swap(candidate)
+        return {"swapped": True, "collection": name, "previous": self.previous_name,
+                "problems": [], "seconds": round(time.time() - started, 3)}
+
+    def _open(self, name: str) -> RevereRAGSystem:
+        return RevereRAGSystem(collection_name=name, persist_directory=self.persist_directory,
+                               embedding_source=self.active, **self.rag_kwargs)
+
+    def rollback(self) -> bool:
+        """Switch back to the previous index version, if one is kept"""
+        with self._swap_lock:
+            if not self.previous_name:
+                return False
+
+            previous = self._previous or self._open(self.previous_name)
+            self._previous = self.active
+            self.previous_name = self.active.collection_name
+            self.active = previous
+            self._write_pointer()
+
+        logger.info(f"↩️ Rolled back to index {self.active.collection_name}")
+        if self.on_swap:
+            self.on_swap(self.active)
+        return True
+
+    def start_rebuild(self, **rebuild_kwargs) -> bool:
+        """
+        Run rebuild() in a low-priority background thread
+
+        Returns:
+            False if a rebuild is already running
+        """
+        if self._rebuild_thread and self._rebuild_thread.is_alive():
+            return False
+
+        self.rebuild_status = {"state": "running", "started_at": time.time()}
+
+        def run():
+            _lower_thread_priority()
+            try:
+                result = self.rebuild(progress=self.rebuild_status.update, **rebuild_kwargs)
+                self.rebuild_status.update(result)
+                self.rebuild_status["state"] = "completed" if result["swapped"] else "rejected"
+            except Exception as e:
+                logger.error(f"Index rebuild failed: {e}")
+                self.rebuild_status.update({"state": "failed", "error": str(e)})
+            self.rebuild_status["finished_at"] = time.time()
+
+        self._rebuild_thread = threading.Thread(target=run, name="index-rebuild", daemon=True)
+        self._rebuild_thread.start()
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """Active and previous versions plus rebuild progress"""
+        return {
+            "active": self.active.collection_name,
+            "previous": self.previous_name,
+            "version": self.version,
+            "rebuild": dict(self.rebuild_status)
+        }
@@ -0,0 +1,181 @@
+# Background ingestion jobs for the Revere RAG system
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Any, Optional
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# File types the ingestion workers know how to index
+SUPPORTED_EXTENSIONS = {'.pdf', '.txt', '.md'}
+
+
+class QueueFullError(Exception):
+    """Raised when too many ingestion jobs are already pending"""
+
+
+@dataclass
+class IngestJob:
+    """Status and progress of one uploaded file being indexed"""
+    id: str
+    filename: str
+    path: str
+    status: str = "queued"
+    pages_done: int = 0
+    chunks_total: int = 0
+    chunks_done: int = 0
+    documents: int = 0
+    error: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def update(self, progress: Dict[str, int]):
+        """Apply a progress report from the RAG system"""
+        for key, value in progress.items():
+            setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable view including throughput"""
+        data = asdict(self)
+        data.pop('path')
+
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        data['elapsed_seconds'] = round(elapsed, 3)
+        data['pages_per_sec'] = round(self.pages_done / elapsed, 2) if elapsed else 0.0
+        data['chunks_per_sec'] = round(self.chunks_done / elapsed, 2) if elapsed else 0.0
+        return data
+
+
+def _lower_thread_priority():
+    """Run ingestion at a lower scheduling priority than request handling"""
+    try:
+        # On Linux this only affects the calling thread
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+class IngestJobQueue:
+    """
+    Bounded pool of background workers indexing spooled uploads
+
+    Jobs run in low-priority threads and index in small batches, so live
+    queries keep being served while a large document is ingested.
+    """
+
+    def __init__(self, rag_system_getter: Callable[[], Any],
+                 max_workers: int = 1, max_pending: int = 16, keep_finished: int = 200,
+                 on_complete: Optional[Callable[[IngestJob], None]] = None,
+                 gate: Optional[Callable[[], ContextManager]] = None,
+                 keep_dir: Optional[str] = None):
+        """
+        Args:
+            rag_system_getter: Returns the RAG system to ingest into (or None)
+            max_workers: Number of concurrent ingestion workers
+            max_pending: Maximum number of queued or running jobs
+            keep_finished: Number of finished jobs kept for status lookups
+            on_complete: Called in the worker thread after each successful job
+            gate: Returns a context manager held while a job writes to the
+                RAG system (e.g. to wait out an index rebuild)
+            keep_dir: Successfully indexed files are moved here under their
+                upload name (so index rebuilds include them) instead of deleted
+        """
+        self.rag_system_getter = rag_system_getter
+        self.gate = gate
+        self.keep_dir = keep_dir
+        self.on_complete = on_complete
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.jobs: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="ingest",
+                                            initializer=_lower_thread_priority)
+
+    def pending_count(self) -> int:
+        """Number of jobs that are queued or running"""
+        return sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, filename: str, path: str) -> IngestJob:
+        """
+        Queue a spooled file for ingestion
+
+        Args:
+            filename: Original upload name, used as the document source
+            path: Spooled file on disk (deleted or kept once the job finishes)
+
+        Returns:
+            The queued job
+        """
+        with self._lock:
+            if self.pending_count() >= self.max_pending:
+                raise QueueFullError(f"{self.max_pending} ingestion jobs already pending")
+
+            job = IngestJob(id=uuid.uuid4().hex, filename=filename, path=path, created_at=time.time())
+            self.jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job)
+        logger.info(f"📥 Queued ingestion job {job.id[:8]} for {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Look up a job by ID"""
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.status in ("completed", "failed")]
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def _run(self, job: IngestJob):
+        try:
+            # The job stays queued while the gate is closed
+            with self.gate() if self.gate else nullcontext():
+                job.status = "running"
+                job.started_at = time.time()
+                rag_system = self.rag_system_getter()
+                if rag_system is None:
+                    raise RuntimeError("RAG system not available")
+
+                extension = os.path.splitext(job.filename)[1].lower()
+                if extension == '.pdf':
+                    doc_ids = rag_system.add_pdf(job.path, source_name=job.filename, progress=job.update)
+                else:
+                    doc_ids = rag_system.add_text_file(job.path, source_name=job.filename, progress=job.update)
+
+            if not doc_ids:
+                raise RuntimeError("No documents were indexed")
+
+            job.documents = len(doc_ids)
+            if self.keep_dir:
+                os.makedirs(self.keep_dir, exist_ok=True)
+                shutil.move(job.path, os.path.join(self.keep_dir, job.filename))
+            job.status = "completed"
+            logger.info(f"✅ Ingestion job {job.id[:8]} indexed {len(doc_ids)} documents from {job.filename}")
+            if self.on_complete:
+                self.on_complete(job)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingestion job {job.id[:8]} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        """Stop accepting work and wait for running jobs"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,171 @@
+# Ingestion helpers for the Revere RAG system
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+# Paragraph boundaries: one or more blank lines
+_BLOCK_SPLIT = re.compile(r'\n[ \t]*\n')
+
+
+def content_hash(content: str) -> str:
+    """MD5 hex digest of a chunk, used as its identity in the manifest"""
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def chunk_text(text: str, max_chars: int = 1200) -> List[Tuple[int, str]]:
+    """
+    Split text into paragraph-aligned chunks
+
+    Paragraphs are packed greedily up to max_chars, and a markdown heading
+    always starts a new chunk. Keeping boundaries tied to the document
+    structure means a small edit only changes the chunks around it, so
+    re-ingestion can skip everything else.
+
+    Args:
+        text: Full document text
+        max_chars: Soft upper bound on chunk length
+
+    Returns:
+        List of (character offset, chunk text) tuples
+    """
+    blocks = []
+    position = 0
+    for match in _BLOCK_SPLIT.finditer(text):
+        blocks.append((position, text[position:match.start()]))
+        position = match.end()
+    blocks.append((position, text[position:]))
+
+    chunks: List[Tuple[int, str]] = []
+    start: Optional[int] = None
+    end = 0
+
+    def flush():
+        if start is not None:
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append((start, chunk))
+
+    for offset, block in blocks:
+        if not block.strip():
+            continue
+
+        # Oversized blocks (long tables, unbroken text) are split on lines
+        if len(block) > max_chars:
+            flush()
+            start = None
+            for piece_offset, piece in _split_long_block(block, max_chars):
+                chunks.append((offset + piece_offset, piece))
+            continue
+
+        is_heading = block.lstrip().startswith('#')
+        if start is not None and (is_heading or offset + len(block) - start > max_chars):
+            flush()
+            start = None
+
+        if start is None:
+            start = offset
+        end = offset + len(block)
+
+    flush()
+    return chunks
+
+
+def _split_long_block(block: str, max_chars: int) -> List[Tuple[int, str]]:
+    """Split a single oversized paragraph on line boundaries"""
+    pieces = []
+    start = 0
+    cursor = 0
+    for line in block.splitlines(keepends=True):
+        if cursor - start + len(line) > max_chars and cursor > start:
+            pieces.append((start, block[start:cursor]))
+            start = cursor
+        cursor += len(line)
+        # A single line longer than max_chars is hard-split
+        while cursor - start > max_chars:
+            pieces.append((start, block[start:start + max_chars]))
+            start += max_chars
+    if cursor > start:
+        pieces.append((start, block[start:cursor]))
+
+    return [(offset, piece.strip()) for offset, piece in pieces if piece.strip()]
+
+
+@dataclass
+class ManifestEntry:
+    """One indexed chunk of a source file"""
+    id: str
+    offset: int
+    md5: str
+    model: str
+
+
+class IndexManifest:
+    """
+    Persistent record of which chunks of each source are indexed
+
+    Stored as JSON next to the vector database so re-ingesting a file can
+    diff against what is already embedded instead of starting over.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sources: Dict[str, List[ManifestEntry]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') != self.VERSION:
+                logger.warning(f"Ignoring manifest with unknown version: {self.path}")
+                return
+            for source, entries in data.get('sources', {}).items():
+                self.sources[source] = [ManifestEntry(**entry) for entry in entries]
+        except Exception as e:
+            logger.error(f"Failed to load index manifest, starting fresh: {e}")
+            self.sources = {}
+
+    def entries(self, source: str) -> List[ManifestEntry]:
+        """Return the indexed chunks recorded for a source"""
+        return self.sources.get(source, [])
+
+    def set_entries(self, source: str, entries: List[ManifestEntry]):
+        """Replace the recorded chunks for a source"""
+        self.sources[source] = entries
+
+    def chunk_count(self) -> int:
+        """Number of indexed chunks across all sources"""
+        return sum(len(entries) for entries in self.sources.values())
+
+    def remove_source(self, source: str):
+        """Forget a source entirely"""
+        self.sources.pop(source, None)
+
+    def save(self):
+        """Write the manifest atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            'version': self.VERSION,
+            'sources': {
+                source: [asdict(entry) for entry in entries]
+                for source, entries in self.sources.items()
+            }
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,90 @@
+# Cheap intent classification for incoming chat messages
+import re
+from typing import List, Tuple
+
+# Intents, in the order they are tried. Everything unmatched is "knowledge".
+GREETING = "greeting"
+THANKS = "thanks"
+HELP = "help"
+TRANSIT_LIVE = "transit_live"
+KNOWLEDGE = "knowledge"
+
+# Messages longer than this are never treated as small talk, so
+# "hi, what is Revere Beach known for?" still reaches the knowledge base
+SMALL_TALK_MAX_WORDS = 6
+
+_FILLER = r"(?:\s+(?:there|all|everyone|revere|assistant|bot|again|so much|a lot|you|very much))*"
+
+# Budget, cost and history questions belong to the knowledge base even when they
+# mention a live-data topic ("How much does the MBTA cost the city now?")
+_KNOWLEDGE_CUES = (r"budget\w*|spen[dt]\w*|cost\w*|fund(?:s|ed|ing)?|expenditures?|appropriat\w*|revenues?"
+                   r"|tax(?:es)?|salar\w*|fiscal|fy ?\d+|histor\w*|founded|opened|built|established|when did")
+
+# Transit questions are only live when they ask about trains running now
+_TRANSIT_LIVE_CUES = (r"next|now|arriv\w*|depart(?:s|ing|ures?)?|delay\w*|running|late|due|on time"
+                      r"|minutes? away")
+_TRANSIT = r"trains?|blue line|mbta|subway|the t"
+
+_PATTERNS: List[Tuple[str, str]] = [
+    (GREETING, rf"^(?:hi|hello|hey|hiya|howdy|yo|greetings|good (?:morning|afternoon|evening)){_FILLER}$"),
+    (THANKS, rf"^(?:thanks|thank you|thx|ty|cheers|great|awesome|perfect|ok(?:ay)?|got it|bye|goodbye){_FILLER}$"),
+    # Zero-width at the start of the message, so it wins over topic words further along
+    (KNOWLEDGE, rf"^(?=.*\b(?:{_KNOWLEDGE_CUES})\b)"),
+    (HELP, r"^(?:help|what can you do|what do you know|how does this work|what can i ask"
+           r"|what are you|who are you|menu|options)(?:\s+(?:me|please|here|for me))*$"),
+    (TRANSIT_LIVE, rf"\b(?:{_TRANSIT_LIVE_CUES})\b.*\b(?:{_TRANSIT})\b"
+                   rf"|\b(?:{_TRANSIT})\b.*\b(?:{_TRANSIT_LIVE_CUES})\b"),
+    # Only intents backed by a real live feed get a route; weather and city
+    # service questions are answered from the knowledge base
+]
+
+_NORMALIZE = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+
+
+class IntentRouter:
+    """
+    Keyword automaton that picks the cheapest correct handler for a message
+
+    All patterns are compiled once into a single alternation of named groups,
+    so classifying a message is one regex scan with no model inference.
+    """
+
+    def __init__(self, patterns: List[Tuple[str, str]] = None):
+        """
+        Args:
+            patterns: (intent, regex) pairs in priority order (defaults to the built-in set)
+        """
+        patterns = patterns or _PATTERNS
+        self.intents = [intent for intent, _ in patterns]
+        self._small_talk = {GREETING, THANKS, HELP}
+        self._regex = re.compile("|".join(
+            f"(?P<i{index}>{pattern})" for index, (_, pattern) in enumerate(patterns)
+        ))
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Lowercase and strip punctuation so patterns only deal with words"""
+        return _SPACES.sub(" ", _NORMALIZE.sub(" ", message.lower())).strip()
+
+    def classify(self, message: str) -> str:
+        """
+        Classify a user message
+
+        Args:
+            message: Raw user text
+
+        Returns:
+            Intent name (KNOWLEDGE if nothing cheaper applies)
+        """
+        text = self.normalize(message)
+        if not text:
+            return GREETING
+
+        word_count = text.count(" ") + 1
+        for match in self._regex.finditer(text):
+            intent = self.intents[int(match.lastgroup[1:])]
+            if intent in self._small_talk and word_count > SMALL_TALK_MAX_WORDS:
+                continue
+            return intent
+        return KNOWLEDGE
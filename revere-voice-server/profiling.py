@@ -0,0 +1,199 @@
+# On-demand CPU sampling and memory accounting for the live server
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Upper bounds so an admin request cannot stall the server indefinitely
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL = 0.001
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_cpu_profile(duration: float = 10.0, interval: float = 0.005,
+                       include_idle: bool = False) -> Dict[str, Any]:
+    """
+    Sample the stacks of every thread for a fixed time
+
+    Nothing is installed in the profiled threads; a sampler reads
+    sys._current_frames() every interval, so overhead is limited to the
+    profiling window and proportional to the sampling rate.
+
+    Args:
+        duration: Seconds to sample (capped at MAX_PROFILE_SECONDS)
+        interval: Seconds between samples
+        include_idle: Keep samples of threads blocked in selectors, queues and sleeps
+
+    Returns:
+        Dictionary with the folded stacks text (flamegraph.pl / speedscope
+        compatible) and sampling statistics
+    """
+    duration = min(max(duration, 0.0), MAX_PROFILE_SECONDS)
+    interval = max(interval, MIN_SAMPLE_INTERVAL)
+    own_id = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    idle_functions = {"select", "poll", "epoll", "wait", "sleep", "_worker", "accept", "acquire"}
+
+    stacks: Counter = Counter()
+    samples = 0
+    started = time.perf_counter()
+    deadline = started + duration
+    while time.perf_counter() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            if not include_idle and frame.f_code.co_name in idle_functions:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            stacks[";".join(reversed(labels))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return {
+        "folded": folded + "\n" if folded else "",
+        "samples": samples,
+        "seconds": round(time.perf_counter() - started, 3),
+        "distinct_stacks": len(stacks)
+    }
+
+
+class TracemallocSession:
+    """Start/stop wrapper keeping a baseline snapshot for diffs"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10):
+        """Begin tracing allocations; every allocation is slower until stop()"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot()
+        self.started_at = time.time()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.started_at = None
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        """
+        Compare current allocations to the baseline
+
+        Args:
+            limit: Number of largest differences returned
+            group_by: 'lineno', 'filename' or 'traceback'
+
+        Returns:
+            Top allocation differences and traced totals
+        """
+        if not tracemalloc.is_tracing() or self.baseline is None:
+            raise RuntimeError("tracemalloc is not running")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "since": self.started_at,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "top": [
+                {
+                    "location": str(stat.traceback),
+                    "size_bytes": stat.size,
+                    "size_diff_bytes": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff
+                }
+                for stat in snapshot.compare_to(self.baseline, group_by)[:limit]
+            ]
+        }
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Approximate bytes held by a container and everything it references
+
+    Shared objects are counted once; numpy arrays count their buffers.
+    """
+    seen = set() if seen is None else seen
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def process_memory() -> Dict[str, int]:
+    """Resident and peak memory of this process in bytes (Linux /proc, else getrusage)"""
+    memory = {}
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM", "RssAnon", "RssFile"):
+                    memory[key.lower() + "_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        memory["vmhwm_bytes"] = maxrss if sys.platform == "darwin" else maxrss * 1024
+    return memory
+
+
+def rag_memory_report(rag) -> Dict[str, Any]:
+    """Byte sizes of a RAG system's in-process structures"""
+    if rag is None:
+        return {}
+
+    report: Dict[str, Any] = {
+        "memory_store_documents": len(rag.memory_store),
+        "memory_store_bytes": deep_sizeof(rag.memory_store),
+    }
+    if rag.embedding_cache is not None:
+        report["embedding_cache_mapped_bytes"] = rag.embedding_cache.get_statistics()['bytes']
+        report["embedding_cache_index_bytes"] = deep_sizeof(rag.embedding_cache._index)
+    if rag.dedup_index is not None:
+        report["dedup_index_bytes"] = deep_sizeof(rag.dedup_index.__dict__)
+    report["manifest_bytes"] = deep_sizeof(rag.manifest.sources)
+
+    shared_index = getattr(rag, "shared_index", None)
+    snapshot = shared_index.snapshot if shared_index is not None else None
+    if snapshot is not None:
+        report["shared_snapshot_mapped_bytes"] = (snapshot.embeddings.nbytes + len(snapshot.contents)
+                                                  + len(snapshot.metadatas))
+        report["shared_snapshot_ids_bytes"] = deep_sizeof(snapshot.ids)
+    return report
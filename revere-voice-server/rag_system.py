@@ -1,40 +1,65 @@
 # RAG System for Revere City Dashboard
 import os
+import re
 import json
+import time
+import bisect
+import threading
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from datetime import datetime
 import numpy as np
 from dataclasses import dataclass
 import pickle
 import hashlib
-
-# Vector database and ML imports
-try:
-    import chromadb
-    from chromadb.utils import embedding_functions
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
+import importlib.util
+
+from ingestion import IndexManifest, ManifestEntry, chunk_text, content_hash
+from embedding_cache import EmbeddingCache
+from dedup import NearDuplicateIndex
+from metrics import STAGE_SECONDS, ERRORS
+from embedders import (HashingEmbedder, create_embedding_backend, is_gemini_model,
+                       is_hashing_model, ONNX_AVAILABLE, SENTENCE_TRANSFORMERS_AVAILABLE)
+
+# Vector database and ML imports are resolved here but only imported when used
+CHROMADB_AVAILABLE = importlib.util.find_spec("chromadb") is not None
+if not CHROMADB_AVAILABLE:
     print("ChromaDB not available. Install with: pip install chromadb")
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-    print("SentenceTransformers not available. Install with: pip install sentence-transformers")
-
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_WORD = re.compile(r'\w+')
+
+
+def _best_snippet(content: str, query: str, window: int) -> str:
+    """Return the window of content containing the most query terms"""
+    if len(content) <= window:
+        return content
+
+    terms = {word for word in _WORD.findall(query.lower()) if len(word) > 2}
+    positions = [match.start() for match in _WORD.finditer(content)
+                 if match.group().lower() in terms]
+    if not positions:
+        return content[:window]
+
+    best_start, best_count = positions[0], 0
+    for i, position in enumerate(positions):
+        count = bisect.bisect_left(positions, position + window, lo=i) - i
+        if count > best_count:
+            best_start, best_count = position, count
+
+    # Lead in a little before the first match, starting on a word boundary
+    start = max(0, min(best_start - window // 4, len(content) - window))
+    if start > 0:
+        boundary = content.rfind(' ', 0, start)
+        start = boundary + 1 if boundary >= 0 and start - boundary < 40 else start
+    return content[start:start + window].strip()
+
+
 @dataclass
 class Document:
     """Represents a document in the RAG system"""
@@ -50,54 +75,159 @@ class RevereRAGSystem:
     Stores documents, generates embeddings, and provides semantic search
     """
 
+    # Maximum number of records per vector database write
+    ADD_BATCH_SIZE = 500
+
+    # Chunks embedded per step when syncing a source, between progress reports
+    SYNC_BATCH_SIZE = 64
+
     def __init__(self,
                  collection_name: str = "revere_documents",
                  persist_directory: str = "./revere_rag_db",
-                 embedding_model: str = "all-MiniLM-L6-v2"):
+                 embedding_model: str = "all-MiniLM-L6-v2",
+                 embedding_cache_mb: int = 512,
+                 near_duplicate_threshold: Optional[float] = 0.9,
+                 embedding_source: Optional["RevereRAGSystem"] = None,
+                 seed_knowledge_base: bool = True,
+                 embedding_threads: Optional[int] = None,
+                 max_seq_length: Optional[int] = None,
+                 shared_index_dir: Optional[str] = None,
+                 use_chromadb: bool = True,
+                 load_embedding_model: bool = True):
         """
         Initialize the RAG system with vector database and embedding model
 
         Args:
             collection_name: Name of the ChromaDB collection
             persist_directory: Directory to persist the vector database
-            embedding_model: Name of the sentence transformer model
+            embedding_model: Name of the sentence transformer model, a Gemini
+                embedding model, "onnx:<directory>" for an exported (quantized)
+                ONNX model, or "hashing"/"hashing-<dim>" for the download-free
+                feature-hashing embedder
+            embedding_cache_mb: Size budget of the on-disk embedding cache (0 disables it)
+            near_duplicate_threshold: MinHash similarity at which a new document is
+                dropped as a duplicate of a stored one (None disables detection)
+            embedding_source: Existing instance whose loaded model and embedding
+                cache are reused when it uses the same embedding model
+            seed_knowledge_base: Whether to add the built-in Revere documents (a
+                collection created without them keeps that choice when reopened)
+            embedding_threads: Intra-op threads for local embedding models
+            max_seq_length: Token limit per text for local embedding models
+            shared_index_dir: Serve queries read-only from the memory-mapped
+                snapshots in this directory instead of opening the vector
+                database (used by multi-worker serving)
+            use_chromadb: Use ChromaDB when installed (False forces the in-memory store)
+            load_embedding_model: Whether to load the embedding model (False for
+                stores that only receive precomputed vectors)
         """
         self.collection_name = collection_name
         self.persist_directory = persist_directory
         self.embedding_model_name = embedding_model
+        self.embedding_cache_mb = embedding_cache_mb
+        self.embedding_threads = embedding_threads
+        self.max_seq_length = max_seq_length
+        self.use_chromadb = use_chromadb
+        self.seed_knowledge_base = seed_knowledge_base
+        self._write_lock = threading.RLock()
+        self.manifest = IndexManifest(
+            os.path.join(persist_directory, f"{collection_name}.manifest.json")
+        )
+
+        self.shared_index = None
+        if shared_index_dir:
+            self._initialize_shared_index(shared_index_dir)
+            logger.info(f"🎯 RAG System serving read-only snapshots from: {shared_index_dir}")
+            return
 
         # Initialize components
-        self._initialize_embedding_model()
         self._initialize_vector_db()
-        self._initialize_knowledge_base()
+        self._route_embedding_model()
+        if not load_embedding_model:
+            self.embedding_model = None
+            self.embedding_cache = None
+        elif embedding_source is not None and embedding_source.embedding_model_name == self.embedding_model_name:
+            self.embedding_model = embedding_source.embedding_model
+            self.embedding_cache = embedding_source.embedding_cache
+        else:
+            self._initialize_embedding_model()
+            self._initialize_embedding_cache()
+        self._initialize_dedup_index(near_duplicate_threshold)
+        if self.seed_knowledge_base:
+            self._initialize_knowledge_base()
 
         logger.info(f"🎯 RAG System initialized with collection: {collection_name}")
 
     def _initialize_embedding_model(self):
         """Initialize the embedding model for semantic search"""
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            try:
-                self.embedding_model = SentenceTransformer(self.embedding_model_name)
-                logger.info(f"✅ Loaded embedding model: {self.embedding_model_name}")
-            except Exception as e:
-                logger.error(f"Failed to load embedding model: {e}")
-                self.embedding_model = None
-        else:
+        name = self.embedding_model_name
+        uses_sentence_transformers = not (is_hashing_model(name) or is_gemini_model(name)
+                                          or name.startswith("onnx:"))
+        if uses_sentence_transformers and not SENTENCE_TRANSFORMERS_AVAILABLE:
             logger.warning("Sentence transformers not available, using simple embeddings")
             self.embedding_model = None
+            return
+
+        try:
+            self.embedding_model = create_embedding_backend(
+                name,
+                intra_op_threads=self.embedding_threads,
+                max_seq_length=self.max_seq_length
+            )
+            logger.info(f"✅ Loaded embedding model: {name} ({type(self.embedding_model).__name__})")
+        except Exception as e:
+            logger.error(f"Failed to load embedding model {name}: {e}")
+            self.embedding_model = None
+
+    def _initialize_embedding_cache(self):
+        """Open the persistent embedding cache for the current model"""
+        self.embedding_cache = None
+        if self.embedding_model is None or self.embedding_cache_mb <= 0:
+            return
+        if not getattr(self.embedding_model, 'cacheable', True):
+            return
+
+        # Vectors differ by ONNX file (int8 or full precision) and token limit, not only by model name
+        identity = self.embedding_model_name
+        variant = getattr(self.embedding_model, 'variant', "")
+        if variant:
+            identity = f"{identity}@{variant}"
+
+        try:
+            self.embedding_cache = EmbeddingCache(
+                os.path.join(self.persist_directory, "embedding_cache"),
+                identity,
+                max_bytes=self.embedding_cache_mb * 1024 * 1024
+            )
+        except Exception as e:
+            logger.error(f"Failed to open embedding cache: {e}")
 
     def _initialize_vector_db(self):
         """Initialize ChromaDB for vector storage"""
-        if CHROMADB_AVAILABLE:
+        self.memory_store = []  # Used whenever ChromaDB is unavailable
+
+        if CHROMADB_AVAILABLE and self.use_chromadb:
             try:
+                import chromadb
+
                 # Create ChromaDB client with persistence
                 self.chroma_client = chromadb.PersistentClient(path=self.persist_directory)
 
-                # Get or create collection
-                self.collection = self.chroma_client.get_or_create_collection(
-                    name=self.collection_name,
-                    metadata={"description": "Revere City knowledge base"}
-                )
+                # Open the existing collection as-is; get_or_create_collection would
+                # overwrite its metadata (and the model it records) on older ChromaDB
+                try:
+                    self.collection = self.chroma_client.get_collection(name=self.collection_name)
+                except Exception:
+                    self.collection = self.chroma_client.create_collection(
+                        name=self.collection_name,
+                        metadata={"description": "Revere City knowledge base",
+                                  "embedding_model": self.embedding_model_name,
+                                  "seed_knowledge_base": self.seed_knowledge_base}
+                    )
+                # Imported collections hold vectors from another model, so seeding them
+                # later would mix embedding spaces
+                stored_seeding = (self.collection.metadata or {}).get("seed_knowledge_base")
+                if stored_seeding is not None:
+                    self.seed_knowledge_base = stored_seeding
 
                 logger.info(f"✅ Vector database initialized: {self.collection.count()} documents")
             except Exception as e:
@@ -106,7 +236,75 @@ class RevereRAGSystem:
         else:
             logger.warning("ChromaDB not available, using in-memory storage")
             self.collection = None
-            self.memory_store = []  # Fallback to simple list storage
+
+    def _initialize_shared_index(self, directory: str):
+        """Attach to shared index snapshots written by the ingestion process"""
+        from shared_index import SharedIndexReader
+
+        self.shared_index = SharedIndexReader(directory)
+        self.collection = None
+        self.memory_store = []
+        self.embedding_cache = None
+        self.dedup_index = None
+
+        # Queries must be embedded with the model that produced the snapshot,
+        # preferably its ONNX export so the worker does not load PyTorch
+        snapshot_model = self.shared_index.meta.get('embedding_model')
+        query_model = self.shared_index.meta.get('query_model')
+        if snapshot_model:
+            self.embedding_model_name = snapshot_model
+            self.collection_name = self.shared_index.meta.get('collection', self.collection_name)
+        if query_model and ONNX_AVAILABLE:
+            self.embedding_model_name = query_model
+            self._initialize_embedding_model()
+            if self.embedding_model is not None:
+                return
+            self.embedding_model_name = snapshot_model
+        self._initialize_embedding_model()
+
+    def _check_writable(self):
+        if self.shared_index is not None:
+            raise RuntimeError("This RAG system serves a read-only shared index; ingest through the writer process")
+
+    def _route_embedding_model(self):
+        """Embed queries with the model that produced the collection's vectors"""
+        if not self.collection:
+            return
+
+        stored_model = (self.collection.metadata or {}).get("embedding_model")
+        if stored_model and stored_model != self.embedding_model_name:
+            logger.info(f"🔀 Collection {self.collection_name} was embedded with {stored_model}, "
+                        f"using it instead of {self.embedding_model_name}")
+            self.embedding_model_name = stored_model
+
+    def _initialize_dedup_index(self, threshold: Optional[float]):
+        """Set up near-duplicate detection ahead of embedding"""
+        if threshold is None:
+            self.dedup_index = None
+            return
+
+        # Signatures are only persisted alongside a persistent collection
+        path = None
+        if self.collection:
+            path = os.path.join(self.persist_directory, f"{self.collection_name}.dedup.pkl")
+        self.dedup_index = NearDuplicateIndex(path=path, threshold=threshold)
+        if self.dedup_index.stale:
+            self.dedup_index.reindex(self._iter_contents())
+            self.dedup_index.save()
+
+    def _iter_contents(self):
+        """Yield (id, content) of every stored document, a page at a time"""
+        if self.collection:
+            offset = 0
+            while True:
+                page = self.collection.get(include=['documents'], limit=5000, offset=offset)
+                if not page['ids']:
+                    return
+                yield from zip(page['ids'], page['documents'])
+                offset += len(page['ids'])
+        else:
+            for doc in self.memory_store:
+                yield doc['id'], doc['content']
 
     def _initialize_knowledge_base(self):
         """Load initial Revere-specific knowledge"""
@@ -179,14 +377,16 @@ class RevereRAGSystem:
             }
         ]
 
-        # Add initial documents to the knowledge base
-        for doc_data in initial_documents:
-            doc_id = self._generate_doc_id(doc_data["content"])
-            if not self._document_exists(doc_id):
-                self.add_document(
-                    content=doc_data["content"],
-                    metadata=doc_data["metadata"]
-                )
+        # Add initial documents to the knowledge base, checking existence in one call
+        doc_ids = [self._generate_doc_id(doc_data["content"]) for doc_data in initial_documents]
+        existing = self._existing_ids(doc_ids)
+        missing = [doc_data for doc_id, doc_data in zip(doc_ids, initial_documents)
+                   if doc_id not in existing]
+        if missing:
+            self.add_documents(
+                contents=[doc_data["content"] for doc_data in missing],
+                metadatas=[doc_data["metadata"] for doc_data in missing]
+            )
 
         logger.info(f"📚 Knowledge base initialized with {len(initial_documents)} documents")
 
@@ -196,13 +396,28 @@ class RevereRAGSystem:
 
     def _document_exists(self, doc_id: str) -> bool:
         """Check if a document already exists in the collection"""
+        return doc_id in self._existing_ids([doc_id])
+
+    def _existing_ids(self, doc_ids: List[str]) -> set:
+        """Return the subset of doc_ids already stored, using a single lookup"""
+        if not doc_ids:
+            return set()
+
+        # Dropped near-duplicates count as present while their canonical copy is
+        references = self.dedup_index.references if self.dedup_index else {}
+        lookup = set(doc_ids) | {references[doc_id] for doc_id in doc_ids if doc_id in references}
+
         if self.collection:
             try:
-                result = self.collection.get(ids=[doc_id])
-                return len(result['ids']) > 0
-            except:
-                return False
-        return False
+                result = self.collection.get(ids=list(lookup), include=[])
+                stored = set(result['ids'])
+            except Exception:
+                return set()
+        else:
+            stored = {doc['id'] for doc in self.memory_store if doc['id'] in lookup}
+
+        return {doc_id for doc_id in doc_ids
+                if doc_id in stored or references.get(doc_id) in stored}
 
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -214,22 +429,86 @@ class RevereRAGSystem:
         Returns:
             Embedding vector as list of floats
         """
-        if self.embedding_model:
+        with STAGE_SECONDS.time("embedding"):
+            if self.embedding_model:
+                try:
+                    # Generate embedding using sentence transformer
+                    embedding = self.embedding_model.encode(text, convert_to_numpy=True)
+                    return embedding.tolist()
+                except Exception as e:
+                    ERRORS.inc("embedding")
+                    logger.error(f"Failed to generate embedding: {e}")
+
+            # Fallback: Simple hash-based embedding
+            return self._simple_embedding(text)
+
+    def _stored_dimension(self) -> Optional[int]:
+        """Dimension of the vectors already stored, if any"""
+        if self.collection:
             try:
-                # Generate embedding using sentence transformer
-                embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-                return embedding.tolist()
+                embeddings = self.collection.get(limit=1, include=['embeddings'])['embeddings']
+                if embeddings is not None and len(embeddings):
+                    return len(embeddings[0])
             except Exception as e:
-                logger.error(f"Failed to generate embedding: {e}")
+                logger.error(f"Failed to read stored embedding dimension: {e}")
+        elif self.memory_store:
+            return len(self.memory_store[0]['embedding'])
+        return None
+
+    def _fallback_dimension(self) -> int:
+        """Dimension the fallback embedder must produce to be comparable with the index"""
+        if getattr(self, '_fallback_dim', None) is None:
+            stored = self._stored_dimension()
+            if stored:
+                self._fallback_dim = stored
+            return stored or getattr(self.embedding_model, 'dim', None) or 384
+        return self._fallback_dim
+
+    def _simple_embedding(self, text: str, dim: Optional[int] = None) -> List[float]:
+        """Generate a simple deterministic embedding for fallback, sized to match the index"""
+        dim = dim or self._fallback_dimension()
+        if getattr(self, '_fallback_embedder', None) is None or self._fallback_embedder.dim != dim:
+            self._fallback_embedder = HashingEmbedder(dim=dim)
+        return self._fallback_embedder.encode(text).tolist()
+
+    def generate_embeddings(self, texts: List[str], use_cache: bool = True) -> List[List[float]]:
+        """
+        Generate embedding vectors for several texts in one batch
+
+        Args:
+            texts: Texts to embed
+            use_cache: Whether to read and populate the embedding cache
+
+        Returns:
+            One embedding vector per input text
+        """
+        if not texts:
+            return []
 
-        # Fallback: Simple hash-based embedding
-        return self._simple_embedding(text)
+        with STAGE_SECONDS.time("embedding_batch"):
+            return self._generate_embeddings(texts, use_cache)
 
-    def _simple_embedding(self, text: str, dim: int = 384) -> List[float]:
-        """Generate a simple deterministic embedding for fallback"""
-        # Create a deterministic pseudo-random embedding
-        np.random.seed(hash(text) % (2**32))
-        return np.random.randn(dim).tolist()
+    def _generate_embeddings(self, texts: List[str], use_cache: bool) -> List[List[float]]:
+        if self.embedding_model:
+            try:
+                if self.embedding_cache is None or not use_cache:
+                    return self.embedding_model.encode(texts, convert_to_numpy=True).tolist()
+
+                # Only texts missing from the cache go through the model
+                embeddings = self.embedding_cache.get_many(texts)
+                missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+                if missing:
+                    missing_texts = [texts[i] for i in missing]
+                    computed = self.embedding_model.encode(missing_texts, convert_to_numpy=True).tolist()
+                    self.embedding_cache.put_many(missing_texts, computed)
+                    for i, embedding in zip(missing, computed):
+                        embeddings[i] = embedding
+                return embeddings
+            except Exception as e:
+                ERRORS.inc("embedding_batch")
+                logger.error(f"Failed to generate batch embeddings: {e}")
+
+        return [self._simple_embedding(text) for text in texts]
 
     def add_document(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """
@@ -242,40 +521,299 @@ class RevereRAGSystem:
         Returns:
             Document ID
         """
-        doc_id = self._generate_doc_id(content)
+        return self.add_documents([content], [metadata])[0]
+
+    def add_documents(self, contents: List[str],
+                      metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+                      ids: Optional[List[str]] = None) -> List[str]:
+        """
+        Add several documents with a single embedding batch and database write
+
+        Args:
+            contents: Document contents
+            metadatas: Optional metadata dictionary per document
+            ids: Optional explicit IDs (defaults to content hashes)
+
+        Returns:
+            Document IDs in input order
+        """
+        if not contents:
+            return []
+        self._check_writable()
+
+        if metadatas is None:
+            metadatas = [None] * len(contents)
+        if ids is None:
+            ids = [self._generate_doc_id(content) for content in contents]
+
+        # Drop near-duplicates before paying for their embeddings
+        resolved_ids = list(ids)
+        if self.dedup_index:
+            kept = self._filter_near_duplicates(contents, ids, resolved_ids)
+            if len(kept) < len(ids):
+                contents = [contents[i] for i in kept]
+                metadatas = [metadatas[i] for i in kept]
+                ids = [ids[i] for i in kept]
+            if not ids:
+                return resolved_ids
 
         # Add timestamp to metadata
-        if metadata is None:
-            metadata = {}
-        metadata['added_at'] = datetime.now().isoformat()
-        metadata['char_count'] = len(content)
+        added_at = datetime.now().isoformat()
+        prepared_metadatas = []
+        for content, metadata in zip(contents, metadatas):
+            metadata = dict(metadata) if metadata else {}
+            metadata['added_at'] = added_at
+            metadata['char_count'] = len(content)
+            prepared_metadatas.append(metadata)
 
-        # Generate embedding
-        embedding = self.generate_embedding(content)
+        # Generate embeddings
+        embeddings = self.generate_embeddings(contents)
 
         # Store in vector database
         if self.collection:
             try:
-                self.collection.add(
-                    embeddings=[embedding],
-                    documents=[content],
-                    metadatas=[metadata],
-                    ids=[doc_id]
-                )
-                logger.info(f"✅ Added document {doc_id[:8]}... to vector database")
+                for start in range(0, len(ids), self.ADD_BATCH_SIZE):
+                    end = start + self.ADD_BATCH_SIZE
+                    self.collection.add(
+                        embeddings=embeddings[start:end],
+                        documents=contents[start:end],
+                        metadatas=prepared_metadatas[start:end],
+                        ids=ids[start:end]
+                    )
+                logger.info(f"✅ Added {len(ids)} document(s) to vector database")
             except Exception as e:
-                logger.error(f"Failed to add document to ChromaDB: {e}")
+                logger.error(f"Failed to add documents to ChromaDB: {e}")
         else:
             # Fallback to memory storage
-            self.memory_store.append({
-                'id': doc_id,
-                'content': content,
-                'metadata': metadata,
-                'embedding': embedding
-            })
-            logger.info(f"✅ Added document {doc_id[:8]}... to memory storage")
+            for doc_id, content, metadata, embedding in zip(ids, contents, prepared_metadatas, embeddings):
+                self.memory_store.append({
+                    'id': doc_id,
+                    'content': content,
+                    'metadata': metadata,
+                    'embedding': embedding
+                })
+            logger.info(f"✅ Added {len(ids)} document(s) to memory storage")
+
+        return resolved_ids
+
+    def _filter_near_duplicates(self, contents: List[str], ids: List[str],
+                                resolved_ids: List[str]) -> List[int]:
+        """
+        Run the near-duplicate stage of the ingestion pipeline
+
+        Args:
+            contents: Candidate document contents
+            ids: IDs they would be stored under
+            resolved_ids: Updated in place with the canonical ID of each dropped document
+
+        Returns:
+            Indices of documents that still need to be embedded and stored
+        """
+        kept, dropped = [], {}
+        batch_ids = set()
+        for i, (doc_id, content) in enumerate(zip(ids, contents)):
+            canonical = self.dedup_index.add(doc_id, content)
+            if canonical is None:
+                kept.append(i)
+                batch_ids.add(doc_id)
+            else:
+                dropped[i] = canonical
+
+        # A canonical copy that is no longer stored cannot stand in for anything
+        outside_batch = {canonical for canonical in dropped.values() if canonical not in batch_ids}
+        if self.collection:
+            try:
+                stored = set(self.collection.get(ids=list(outside_batch), include=[])['ids']) if outside_batch else set()
+            except Exception:
+                stored = set()
+        else:
+            stored = {doc['id'] for doc in self.memory_store if doc['id'] in outside_batch}
+        orphaned = outside_batch - stored
+        if orphaned:
+            self.dedup_index.remove(list(orphaned), keep_referenced=False)
+
+        for i, canonical in dropped.items():
+            if canonical in orphaned:
+                self.dedup_index.add(ids[i], contents[i])
+                kept.append(i)
+                batch_ids.add(ids[i])
+            else:
+                resolved_ids[i] = canonical
+
+        kept.sort()
+        self.dedup_index.save()
+
+        skipped = len(ids) - len(kept)
+        if skipped:
+            logger.info(f"♻️ Skipped {skipped} near-duplicate document(s)")
+        return kept
+
+    def add_precomputed(self, ids: List[str], contents: List[str],
+                        metadatas: List[Dict[str, Any]], embeddings: List[List[float]]):
+        """
+        Store documents whose embeddings were computed elsewhere
+
+        Nothing is embedded and the near-duplicate stage is skipped: the
+        export is taken as-is. Existing IDs are overwritten, so re-running an
+        import is safe.
 
-        return doc_id
+        Args:
+            ids: Document IDs
+            contents: Document contents
+            metadatas: Flat metadata dictionaries
+            embeddings: Vectors from the same model as this collection
+        """
+        if not ids:
+            return
+        self._check_writable()
+
+        if self.collection:
+            for start in range(0, len(ids), self.ADD_BATCH_SIZE):
+                end = start + self.ADD_BATCH_SIZE
+                self.collection.upsert(
+                    ids=ids[start:end],
+                    documents=contents[start:end],
+                    metadatas=metadatas[start:end],
+                    embeddings=embeddings[start:end]
+                )
+        else:
+            replaced = set(ids)
+            self.memory_store = [doc for doc in self.memory_store if doc['id'] not in replaced]
+            for doc_id, content, metadata, embedding in zip(ids, contents, metadatas, embeddings):
+                self.memory_store.append({
+                    'id': doc_id,
+                    'content': content,
+                    'metadata': metadata,
+                    'embedding': embedding
+                })
+
+    def delete_documents(self, doc_ids: List[str]):
+        """Remove documents from the RAG system by ID"""
+        if not doc_ids:
+            return
+        self._check_writable()
+
+        # Canonical copies of dropped near-duplicates stay until those are gone too
+        if self.dedup_index:
+            doc_ids = self.dedup_index.remove(doc_ids)
+            self.dedup_index.save()
+            if not doc_ids:
+                return
+
+        if self.collection:
+            try:
+                self.collection.delete(ids=list(doc_ids))
+            except Exception as e:
+                logger.error(f"Failed to delete documents from ChromaDB: {e}")
+        else:
+            doomed = set(doc_ids)
+            self.memory_store = [doc for doc in self.memory_store if doc['id'] not in doomed]
+
+        logger.info(f"🗑️ Removed {len(doc_ids)} document(s)")
+
+    def _update_offsets(self, offsets: Dict[str, int]):
+        """Record new chunk offsets for unchanged chunks without re-embedding them"""
+        if not offsets:
+            return
+
+        if self.collection:
+            try:
+                ids = list(offsets)
+                self.collection.update(
+                    ids=ids,
+                    metadatas=[{'offset': offsets[doc_id]} for doc_id in ids]
+                )
+            except Exception as e:
+                logger.error(f"Failed to update chunk offsets in ChromaDB: {e}")
+        else:
+            for doc in self.memory_store:
+                if doc['id'] in offsets:
+                    doc['metadata']['offset'] = offsets[doc['id']]
+
+    def sync_source(self, source: str, chunks: List[tuple],
+                    metadata: Optional[Dict[str, Any]] = None,
+                    progress: Optional[Callable[[Dict[str, int]], None]] = None) -> List[str]:
+        """
+        Bring the indexed chunks of a source in line with its current content
+
+        Chunks are identified by content hash. Only added or changed chunks
+        are embedded, chunks that disappeared are deleted, and unchanged
+        chunks that merely moved have their offset metadata updated.
+
+        Args:
+            source: Source name shared by all chunks (e.g. file name)
+            chunks: (offset, content) or (offset, content, extra_metadata) tuples
+            metadata: Metadata applied to every chunk
+            progress: Optional callback receiving chunks_total/chunks_done counts
+
+        Returns:
+            Document IDs of the current chunks in source order
+        """
+        with self._write_lock:
+            return self._sync_source(source, chunks, metadata, progress)
+
+    def _sync_source(self, source: str, chunks: List[tuple],
+                     metadata: Optional[Dict[str, Any]],
+                     progress: Optional[Callable[[Dict[str, int]], None]]) -> List[str]:
+        previous = {entry.md5: entry for entry in self.manifest.entries(source)
+                    if entry.model == self.embedding_model_name}
+        present = self._existing_ids([entry.id for entry in previous.values()])
+
+        entries = []
+        new_contents, new_metadatas, new_ids = [], [], []
+        moved = {}
+        seen = set()
+
+        for chunk in chunks:
+            offset, content = chunk[0], chunk[1]
+            digest = content_hash(content)
+            if digest in seen:
+                # Exact repeat within the same source is stored once
+                continue
+            seen.add(digest)
+
+            known = previous.get(digest)
+            if known and known.id in present:
+                if known.offset != offset:
+                    moved[known.id] = offset
+                entries.append(ManifestEntry(known.id, offset, digest, self.embedding_model_name))
+                continue
+
+            doc_id = self._generate_doc_id(f"{source}\x00{content}")
+            chunk_metadata = dict(metadata or {})
+            chunk_metadata['source'] = source
+            chunk_metadata['offset'] = offset
+            if len(chunk) > 2 and chunk[2]:
+                chunk_metadata.update(chunk[2])
+
+            new_contents.append(content)
+            new_metadatas.append(chunk_metadata)
+            new_ids.append(doc_id)
+            entries.append(ManifestEntry(doc_id, offset, digest, self.embedding_model_name))
+
+        current_ids = {entry.id for entry in entries}
+        stale_ids = [entry.id for entry in self.manifest.entries(source)
+                     if entry.id not in current_ids]
+
+        self.delete_documents(stale_ids)
+
+        # Embed in small steps so progress is visible and readers are not starved
+        if progress:
+            progress({'chunks_total': len(new_ids), 'chunks_done': 0})
+        for start in range(0, len(new_ids), self.SYNC_BATCH_SIZE):
+            end = start + self.SYNC_BATCH_SIZE
+            self.add_documents(new_contents[start:end], new_metadatas[start:end], new_ids[start:end])
+            if progress:
+                progress({'chunks_done': min(end, len(new_ids))})
+
+        self._update_offsets(moved)
+
+        self.manifest.set_entries(source, entries)
+        self.manifest.save()
+
+        logger.info(f"🔄 Synced {source}: {len(new_ids)} embedded, "
+                    f"{len(entries) - len(new_ids)} unchanged, {len(stale_ids)} removed")
+        return [entry.id for entry in entries]
 
     def search(self, query: str, k: int = 5, filter_metadata: Optional[Dict] = None) -> List[Dict[str, Any]]:
         """
@@ -289,49 +827,189 @@ class RevereRAGSystem:
         Returns:
             List of relevant documents with scores
         """
+        handles = self.search_handles(query, k=k, filter_metadata=filter_metadata)
+        return self.fetch_documents(handles)
+
+    def search_handles(self, query: str, k: int = 5,
+                       filter_metadata: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """
+        Search for relevant documents, returning only IDs and distances
+
+        Use fetch_documents to load content and metadata for the handles that
+        are actually needed.
+
+        Args:
+            query: Search query
+            k: Number of results to return
+            filter_metadata: Optional metadata filters
+
+        Returns:
+            List of {'id', 'distance'} handles, closest first
+        """
         # Generate query embedding
         query_embedding = self.generate_embedding(query)
 
-        results = []
+        started = time.perf_counter()
+        handles = []
 
-        if self.collection:
+        if self.shared_index is not None:
+            if filter_metadata:
+                logger.warning("Metadata filters are not supported on the shared index, ignoring")
+            handles = self.shared_index.search(np.array([query_embedding]), k)[0]
+        elif self.collection:
             try:
-                # Search in ChromaDB
+                # Search in ChromaDB without pulling documents or metadata
                 search_results = self.collection.query(
                     query_embeddings=[query_embedding],
                     n_results=k,
-                    where=filter_metadata if filter_metadata else None
+                    where=filter_metadata if filter_metadata else None,
+                    include=['distances']
                 )
 
-                # Format results
-                for i in range(len(search_results['ids'][0])):
-                    results.append({
-                        'id': search_results['ids'][0][i],
-                        'content': search_results['documents'][0][i],
-                        'metadata': search_results['metadatas'][0][i],
-                        'distance': search_results['distances'][0][i] if 'distances' in search_results else 0
-                    })
+                distances = search_results.get('distances') or [[0] * len(search_results['ids'][0])]
+                for doc_id, distance in zip(search_results['ids'][0], distances[0]):
+                    handles.append({'id': doc_id, 'distance': distance})
 
-                logger.info(f"🔍 Found {len(results)} relevant documents for query: {query[:50]}...")
+                logger.info(f"🔍 Found {len(handles)} relevant documents for query: {query[:50]}...")
             except Exception as e:
+                ERRORS.inc("search")
                 logger.error(f"Search failed in ChromaDB: {e}")
         else:
             # Fallback: Simple cosine similarity search in memory
-            if self.memory_store:
-                for doc in self.memory_store:
-                    score = self._cosine_similarity(query_embedding, doc['embedding'])
-                    results.append({
-                        'id': doc['id'],
-                        'content': doc['content'],
-                        'metadata': doc['metadata'],
-                        'distance': 1 - score  # Convert similarity to distance
-                    })
-
-                # Sort by distance and return top k
-                results.sort(key=lambda x: x['distance'])
-                results = results[:k]
-
-        return results
+            for doc in self.memory_store:
+                if filter_metadata and any(doc['metadata'].get(key) != value
+                                           for key, value in filter_metadata.items()):
+                    continue
+                score = self._cosine_similarity(query_embedding, doc['embedding'])
+                handles.append({
+                    'id': doc['id'],
+                    'distance': 1 - score  # Convert similarity to distance
+                })
+
+            # Sort by distance and return top k
+            handles.sort(key=lambda x: x['distance'])
+            handles = handles[:k]
+
+        STAGE_SECONDS.observe(time.perf_counter() - started, "search")
+        return handles
+
+    def search_handles_batch(self, queries: List[str], k: int = 5,
+                             filter_metadata: Optional[Dict] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries with one embedding batch and one vector query
+
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            filter_metadata: Optional metadata filters applied to every query
+
+        Returns:
+            One list of {'id', 'distance'} handles per query, in input order
+        """
+        if not queries:
+            return []
+
+        query_embeddings = self.generate_embeddings(queries, use_cache=False)
+        started = time.perf_counter()
+        all_handles: List[List[Dict[str, Any]]] = [[] for _ in queries]
+
+        if self.shared_index is not None:
+            if filter_metadata:
+                logger.warning("Metadata filters are not supported on the shared index, ignoring")
+            all_handles = self.shared_index.search(np.array(query_embeddings), k)
+        elif self.collection:
+            try:
+                search_results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=k,
+                    where=filter_metadata if filter_metadata else None,
+                    include=['distances']
+                )
+
+                for i, ids in enumerate(search_results['ids']):
+                    distances = search_results['distances'][i] if search_results.get('distances') else [0] * len(ids)
+                    all_handles[i] = [{'id': doc_id, 'distance': distance}
+                                      for doc_id, distance in zip(ids, distances)]
+
+                logger.info(f"🔍 Batch search completed for {len(queries)} queries")
+            except Exception as e:
+                ERRORS.inc("search_batch")
+                logger.error(f"Batch search failed in ChromaDB: {e}")
+        else:
+            docs = [doc for doc in self.memory_store
+                    if not filter_metadata or all(doc['metadata'].get(key) == value
+                                                  for key, value in filter_metadata.items())]
+            if docs:
+                matrix = np.array([doc['embedding'] for doc in docs], dtype=np.float32)
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                queries_matrix = np.array(query_embeddings, dtype=np.float32)
+                queries_matrix /= np.maximum(np.linalg.norm(queries_matrix, axis=1, keepdims=True), 1e-12)
+
+                distances = 1 - queries_matrix @ matrix.T
+                top = min(k, len(docs))
+                for i, row in enumerate(distances):
+                    best = np.argpartition(row, top - 1)[:top]
+                    best = best[np.argsort(row[best])]
+                    all_handles[i] = [{'id': docs[j]['id'], 'distance': float(row[j])} for j in best]
+
+        STAGE_SECONDS.observe(time.perf_counter() - started, "search_batch")
+        return all_handles
+
+    def fetch_documents(self, handles: List[Dict[str, Any]],
+                        include_content: bool = True,
+                        snippet_query: Optional[str] = None,
+                        snippet_chars: int = 200) -> List[Dict[str, Any]]:
+        """
+        Hydrate search handles with stored content and metadata
+
+        Args:
+            handles: Handles returned by search_handles
+            include_content: Whether to return the full document content
+            snippet_query: If given, add a 'snippet' window around the span
+                that best matches this query
+            snippet_chars: Length of the snippet window
+
+        Returns:
+            Copies of the handles with 'metadata' and the requested text fields
+        """
+        if not handles:
+            return []
+
+        started = time.perf_counter()
+        ids = [handle['id'] for handle in handles]
+        stored = {}
+
+        if self.shared_index is not None:
+            stored = self.shared_index.fetch(handles)
+        elif self.collection:
+            try:
+                result = self.collection.get(ids=ids, include=['documents', 'metadatas'])
+                for doc_id, content, metadata in zip(result['ids'], result['documents'], result['metadatas']):
+                    stored[doc_id] = (content, metadata)
+            except Exception as e:
+                ERRORS.inc("hydrate")
+                logger.error(f"Failed to fetch documents from ChromaDB: {e}")
+        else:
+            wanted = set(ids)
+            for doc in self.memory_store:
+                if doc['id'] in wanted:
+                    stored[doc['id']] = (doc['content'], doc['metadata'])
+
+        documents = []
+        for handle in handles:
+            if handle['id'] not in stored:
+                continue
+            content, metadata = stored[handle['id']]
+            document = dict(handle)
+            document['metadata'] = metadata or {}
+            if include_content:
+                document['content'] = content
+            if snippet_query is not None:
+                document['snippet'] = _best_snippet(content, snippet_query, snippet_chars)
+            documents.append(document)
+
+        STAGE_SECONDS.observe(time.perf_counter() - started, "hydrate")
+        return documents
 
     def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -363,8 +1041,12 @@ class RevereRAGSystem:
         if not context_docs:
             return "I don't have enough information to answer your question about Revere."
 
+        with STAGE_SECONDS.time("generate_answer"):
+            return self._generate_answer(query, context_docs, use_llm)
+
+    def _generate_answer(self, query: str, context_docs: List[Dict[str, Any]], use_llm: bool) -> str:
         # Combine context from retrieved documents
-        context = "\n\n".join([doc['content'] for doc in context_docs[:3]])
+        context = "\n\n".join([doc.get('content') or doc.get('snippet', '') for doc in context_docs[:3]])
 
         if use_llm and OPENAI_AVAILABLE:
             # Use OpenAI for generation (requires API key)
@@ -372,6 +1054,7 @@ class RevereRAGSystem:
                 response = self._generate_with_llm(query, context)
                 return response
             except Exception as e:
+                ERRORS.inc("generate_answer")
                 logger.error(f"LLM generation failed: {e}")
 
         # Fallback: Template-based response
@@ -384,7 +1067,8 @@ class RevereRAGSystem:
 
         # Add relevant information from top documents
         for i, doc in enumerate(docs[:2], 1):
-            response += f"{i}. {doc['content'][:200]}...\n\n"
+            text = doc.get('snippet') or doc.get('content', '')[:200]
+            response += f"{i}. {text}...\n\n"
 
         # Add metadata information
         sources = list(set([doc['metadata'].get('source', 'unknown') for doc in docs[:3]]))
@@ -393,13 +1077,18 @@ class RevereRAGSystem:
 
         return response
 
-    def ask(self, question: str, use_llm: bool = False) -> Dict[str, Any]:
+    def ask(self, question: str, use_llm: bool = False, snippet_chars: int = 200) -> Dict[str, Any]:
         """
         Main Q&A interface - search for relevant docs and generate answer
 
+        Only the documents that end up in the answer are hydrated. Template
+        answers get a snippet window around the best-matching span instead of
+        the full content; the remaining results are returned as bare handles.
+
         Args:
             question: User's question
             use_llm: Whether to use LLM for answer generation
+            snippet_chars: Snippet length used for template answers
 
         Returns:
             Dictionary with answer and metadata
@@ -407,24 +1096,59 @@ class RevereRAGSystem:
         logger.info(f"❓ Processing question: {question}")
 
         # Search for relevant documents
-        relevant_docs = self.search(question, k=5)
+        handles = self.search_handles(question, k=5)
+        return self._answer_from_handles(question, handles, use_llm, snippet_chars)
+
+    def ask_batch(self, questions: List[str], use_llm: bool = False,
+                  snippet_chars: int = 200) -> List[Dict[str, Any]]:
+        """
+        Answer many questions using a single batched retrieval pass
+
+        Args:
+            questions: User questions
+            use_llm: Whether to use LLM for answer generation
+            snippet_chars: Snippet length used for template answers
+
+        Returns:
+            One ask() style result per question, in input order
+        """
+        all_handles = self.search_handles_batch(questions, k=5)
+        return [self._answer_from_handles(question, handles, use_llm, snippet_chars)
+                for question, handles in zip(questions, all_handles)]
+
+    def _answer_from_handles(self, question: str, handles: List[Dict[str, Any]],
+                             use_llm: bool, snippet_chars: int) -> Dict[str, Any]:
+        """Hydrate the handles an answer needs and generate it"""
+        # Hydrate only what the answer renders
+        if use_llm and OPENAI_AVAILABLE:
+            context_docs = self.fetch_documents(handles[:3])
+        else:
+            context_docs = self.fetch_documents(handles[:3], include_content=False,
+                                                snippet_query=question,
+                                                snippet_chars=snippet_chars)
+
+        # Handles whose documents were deleted since the search are skipped by fetch_documents
+        unresolved = len(handles[:3]) - len(context_docs)
+        if unresolved:
+            logger.warning(f"⚠️ Skipped {unresolved} search result(s) no longer in the index")
 
         # Generate answer
-        answer = self.generate_answer(question, relevant_docs, use_llm)
+        answer = self.generate_answer(question, context_docs, use_llm)
 
         return {
             'question': question,
             'answer': answer,
-            'sources': relevant_docs,
+            'sources': context_docs + handles[3:],
             'timestamp': datetime.now().isoformat(),
             'method': 'rag_retrieval'
         }
 
-    def add_pdf(self, pdf_path: str) -> List[str]:
-        """Add a PDF document to the knowledge base"""
+    def add_pdf(self, pdf_path: str, source_name: Optional[str] = None,
+                progress: Optional[Callable[[Dict[str, int]], None]] = None) -> List[str]:
+        """Add a PDF document to the knowledge base, re-embedding only changed pages"""
         try:
             import PyPDF2
-            doc_ids = []
+            chunks = []
 
             with open(pdf_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
@@ -432,15 +1156,16 @@ class RevereRAGSystem:
                 for page_num, page in enumerate(pdf_reader.pages):
                     text = page.extract_text()
                     if text.strip():
-                        doc_id = self.add_document(
-                            content=text,
-                            metadata={
-                                'source': os.path.basename(pdf_path),
-                                'page': page_num + 1,
-                                'type': 'pdf'
-                            }
-                        )
-                        doc_ids.append(doc_id)
+                        chunks.append((page_num + 1, text, {'page': page_num + 1}))
+                    if progress:
+                        progress({'pages_done': page_num + 1})
+
+            doc_ids = self.sync_source(
+                source_name or os.path.basename(pdf_path),
+                chunks,
+                metadata={'type': 'pdf'},
+                progress=progress
+            )
 
             logger.info(f"📄 Added PDF with {len(doc_ids)} pages: {pdf_path}")
             return doc_ids
@@ -448,25 +1173,43 @@ class RevereRAGSystem:
             logger.error(f"Failed to add PDF: {e}")
             return []
 
-    def add_text_file(self, file_path: str) -> str:
-        """Add a text file to the knowledge base"""
+    def add_text_file(self, file_path: str, max_chunk_chars: int = 1200,
+                      source_name: Optional[str] = None,
+                      progress: Optional[Callable[[Dict[str, int]], None]] = None) -> List[str]:
+        """Add a text file to the knowledge base, re-embedding only changed chunks"""
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
 
-            doc_id = self.add_document(
-                content=content,
-                metadata={
-                    'source': os.path.basename(file_path),
-                    'type': 'text'
-                }
+            doc_ids = self.sync_source(
+                source_name or os.path.basename(file_path),
+                chunk_text(content, max_chars=max_chunk_chars),
+                metadata={'type': 'text'},
+                progress=progress
             )
 
-            logger.info(f"📝 Added text file: {file_path}")
-            return doc_id
+            logger.info(f"📝 Added text file with {len(doc_ids)} chunks: {file_path}")
+            return doc_ids
         except Exception as e:
             logger.error(f"Failed to add text file: {e}")
-            return ""
+            return []
+
+    def drop_index(self):
+        """Delete this instance's collection and its manifest and signature files"""
+        if self.collection:
+            try:
+                self.chroma_client.delete_collection(name=self.collection_name)
+            except Exception as e:
+                logger.error(f"Failed to delete collection {self.collection_name}: {e}")
+            self.collection = None
+        self.memory_store = []
+
+        for path in (self.manifest.path,
+                     self.dedup_index.path if self.dedup_index else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+        logger.info(f"🗑️ Dropped index {self.collection_name}")
 
     def get_statistics(self) -> Dict[str, Any]:
         """Get statistics about the RAG system"""
@@ -474,11 +1217,16 @@ class RevereRAGSystem:
             'total_documents': 0,
             'collection_name': self.collection_name,
             'embedding_model': self.embedding_model_name,
-            'vector_db': 'ChromaDB' if self.collection else 'Memory',
+            'vector_db': 'SharedSnapshot' if self.shared_index else 'ChromaDB' if self.collection else 'Memory',
+            'near_duplicates': len(self.dedup_index.references) if self.dedup_index else 0,
+            'embedding_cache': self.embedding_cache.get_statistics() if self.embedding_cache else None,
             'categories': {}
         }
 
-        if self.collection:
+        if self.shared_index is not None:
+            stats['total_documents'] = self.shared_index.count
+            stats['categories'] = dict(self.shared_index.category_counts())
+        elif self.collection:
             try:
                 stats['total_documents'] = self.collection.count()
 
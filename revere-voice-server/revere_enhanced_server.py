@@ -1,46 +1,102 @@
 # revere_enhanced_server.py - Enhanced WebSocket server with RAG system integration
 import asyncio
 import json
+import os
+import hmac
+import importlib.util
+import uuid
 import logging
 import struct
 import time
 import io
 import wave
+import weakref
 import websockets
 import requests
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, Depends, Header, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
-
-# Import RAG system
-try:
-    from rag_system import RevereRAGSystem
-    RAG_AVAILABLE = True
-except ImportError:
-    RAG_AVAILABLE = False
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager, nullcontext
+
+# The RAG system and speech recognition are imported on first use so the
+# server starts accepting connections immediately
+RAG_AVAILABLE = (importlib.util.find_spec("rag_system") is not None
+                 and importlib.util.find_spec("numpy") is not None)
+if not RAG_AVAILABLE:
     print("WARNING: RAG system not available")
 
-try:
-    import speech_recognition as sr
-    SPEECH_RECOGNITION_AVAILABLE = True
-except ImportError:
-    SPEECH_RECOGNITION_AVAILABLE = False
-    print("WARNING: speech_recognition not available. Installing...")
-    import subprocess
-    subprocess.check_call(["pip", "install", "SpeechRecognition"])
-    import speech_recognition as sr
-    SPEECH_RECOGNITION_AVAILABLE = True
+SPEECH_RECOGNITION_AVAILABLE = importlib.util.find_spec("speech_recognition") is not None
+if not SPEECH_RECOGNITION_AVAILABLE:
+    print("WARNING: speech_recognition not available. Install with: pip install SpeechRecognition")
+
+# "google" uses the Google Web Speech API; "stub" is a local deterministic
+# recognizer for load testing (REVERE_STT_STUB_LATENCY_MS simulates its cost),
+# which also replaces the live MBTA feed with fixed predictions
+STT_BACKEND = os.environ.get("REVERE_STT_BACKEND", "google")
+STT_STUB_LATENCY_MS = float(os.environ.get("REVERE_STT_STUB_LATENCY_MS", "0"))
+
+from ingest_jobs import IngestJobQueue, QueueFullError, SUPPORTED_EXTENSIONS
+from intent_router import IntentRouter, GREETING, THANKS, HELP, TRANSIT_LIVE
+from metrics import REGISTRY, CONTENT_TYPE, STAGE_SECONDS, ERRORS, Counter, Gauge
+
+if TYPE_CHECKING:
+    from index_versions import IndexVersionManager
+    from rag_system import RevereRAGSystem
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Uploaded files are written here before background ingestion picks them up
+INGEST_SPOOL_DIR = os.environ.get("REVERE_INGEST_SPOOL_DIR", "./ingest_spool")
+INGEST_WORKERS = int(os.environ.get("REVERE_INGEST_WORKERS", "1"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Collection to serve; imported collections (e.g. budget_chunks_d768) bring their own query model
+RAG_COLLECTION = os.environ.get("REVERE_RAG_COLLECTION", "revere_documents")
+
+# Embedding backend for new collections ("onnx:<dir>" for an exported int8 model), its
+# intra-op thread count and token limit (unset: the backend defaults)
+EMBEDDING_MODEL = os.environ.get("REVERE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_THREADS = int(os.environ.get("REVERE_EMBEDDING_THREADS") or 0) or None
+MAX_SEQ_LENGTH = int(os.environ.get("REVERE_MAX_SEQ_LENGTH") or 0) or None
+
+# Process role: "standalone" (single process), or under serve.py one "writer"
+# that owns ingestion and many "reader" workers serving a shared snapshot
+SERVER_ROLE = os.environ.get("REVERE_ROLE", "standalone")
+SHARED_INDEX_DIR = os.environ.get("REVERE_SHARED_INDEX_DIR", "./revere_rag_db/shared_index")
+SHARED_INDEX_WAIT_SECONDS = 2.0
+
+# Profiling, memory and index version endpoints are only mounted when an admin token is configured
+ADMIN_TOKEN = os.environ.get("REVERE_ADMIN_TOKEN")
+
+# Index rebuilds only read source files under this directory
+INDEX_SOURCE_DIR = os.environ.get("REVERE_INDEX_SOURCE_DIR", "./index_sources")
+# Files accepted through /ingest are kept here, and every rebuild re-ingests them
+INDEX_UPLOAD_DIR = os.path.join(INDEX_SOURCE_DIR, "uploads")
+
+# Request-level metrics; stage latencies live in metrics.STAGE_SECONDS
+INTENTS = Counter("revere_intents_total", "Messages by routed intent", ["intent"])
+FALLBACKS = Counter("revere_fallback_responses_total", "Template fallback answers, by reason", ["reason"])
+ACTIVE_CONNECTIONS = Gauge("revere_active_connections", "Open WebSocket connections")
+INGEST_QUEUE_DEPTH = Gauge("revere_ingest_queue_depth", "Ingestion jobs queued or running")
+RAG_READY = Gauge("revere_rag_ready", "1 once the RAG system has finished warming up")
+EMBEDDING_CACHE_LOOKUPS = Counter("revere_embedding_cache_lookups_total",
+                                  "Embedding cache lookups, summed across index versions", ["result"])
+
 class RevereDataAPI:
     """Handles real-time data fetching from Revere city APIs"""
 
+    # Without an API key the MBTA allows about 20 requests a minute, so every
+    # transit question within this window reuses one prediction payload
+    MBTA_CACHE_SECONDS = 20.0
+    _mbta_cache: Optional[tuple] = None  # (fetched_at, payload or None if the fetch failed)
+    _mbta_lock: Optional[asyncio.Lock] = None
+
     @staticmethod
     async def fetch_weather_data() -> Optional[Dict[str, Any]]:
         """Fetch real-time weather data for Revere, MA"""
@@ -65,32 +121,70 @@ class RevereDataAPI:
             logger.error(f"Weather API error: {e}")
             return None
 
+    @classmethod
+    async def fetch_mbta_data(cls) -> Optional[Dict[str, Any]]:
+        """Fetch real-time MBTA Blue Line data (predictions are cached for MBTA_CACHE_SECONDS)"""
+        if cls._mbta_lock is None:
+            cls._mbta_lock = asyncio.Lock()
+        async with cls._mbta_lock:
+            if cls._mbta_cache is None or time.monotonic() - cls._mbta_cache[0] >= cls.MBTA_CACHE_SECONDS:
+                # Failures are cached too, so a rate-limited API is not retried on every question
+                cls._mbta_cache = (time.monotonic(), await cls._fetch_mbta_predictions())
+            data = cls._mbta_cache[1]
+
+        if data is None:
+            return None
+        predictions = data.get('data', [])
+        # Minutes are recomputed from the predicted times, so cached arrivals stay current
+        return {
+            "predictions": len(predictions),
+            "route": "Blue Line",
+            "stations": ["Wonderland", "Revere Beach", "Beachmont", "Suffolk Downs"],
+            "next_arrivals": cls._mbta_arrivals(predictions, data.get('included', [])),
+            "source": "MBTA API v3",
+            "timestamp": datetime.now().isoformat()
+        }
+
     @staticmethod
-    async def fetch_mbta_data() -> Optional[Dict[str, Any]]:
-        """Fetch real-time MBTA Blue Line data"""
+    async def _fetch_mbta_predictions() -> Optional[Dict[str, Any]]:
+        # Load runs must not hit the rate-limited MBTA API
+        if STT_BACKEND == "stub":
+            from stt_stub import stub_mbta_predictions
+            return stub_mbta_predictions()
         try:
-            url = "https://api-v3.mbta.com/predictions?filter[route]=Blue&filter[stop]=place-wondl,place-rbmnl&limit=5"
-            response = requests.get(url, timeout=5)
-
+            url = ("https://api-v3.mbta.com/predictions?filter[route]=Blue&filter[stop]=place-wondl,place-rbmnl"
+                   "&include=stop&sort=arrival_time&limit=5")
+            response = await asyncio.to_thread(requests.get, url, timeout=5)
             if response.status_code == 200:
-                data = response.json()
-                predictions = data.get('data', [])
-
-                return {
-                    "predictions": len(predictions),
-                    "route": "Blue Line",
-                    "stations": ["Wonderland", "Revere Beach", "Beachmont", "Suffolk Downs"],
-                    "next_arrivals": [
-                        {"station": "Wonderland", "minutes": 3},
-                        {"station": "Revere Beach", "minutes": 8},
-                        {"station": "Beachmont", "minutes": 12}
-                    ],
-                    "source": "MBTA API v3",
-                    "timestamp": datetime.now().isoformat()
-                }
+                return response.json()
+            logger.error(f"MBTA API returned status {response.status_code}")
         except Exception as e:
             logger.error(f"MBTA API error: {e}")
-            return None
+        return None
+
+    @staticmethod
+    def _mbta_arrivals(predictions: List[Dict[str, Any]], included: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Minutes until each predicted train, from MBTA v3 prediction resources"""
+        stops = {item['id']: item.get('attributes', {}).get('name')
+                 for item in included if item.get('type') == 'stop'}
+        now = datetime.now(timezone.utc)
+
+        arrivals = []
+        for prediction in predictions:
+            attributes = prediction.get('attributes', {})
+            predicted = attributes.get('arrival_time') or attributes.get('departure_time')
+            if not predicted:
+                continue
+            minutes = int((datetime.fromisoformat(predicted) - now).total_seconds() // 60)
+            if minutes < 0:
+                continue
+            stop_id = prediction.get('relationships', {}).get('stop', {}).get('data', {}).get('id')
+            arrivals.append({
+                "station": stops.get(stop_id) or stop_id,
+                "direction": "Wonderland" if attributes.get('direction_id') == 1 else "Bowdoin",
+                "minutes": minutes
+            })
+        return arrivals
 
     @staticmethod
     async def fetch_census_data() -> Optional[Dict[str, Any]]:
@@ -150,26 +244,92 @@ class EnhancedMessageProcessor:
 
     def __init__(self):
         self.data_api = RevereDataAPI()
-        self.conversation_history = []
-
-        # Initialize RAG system
-        if RAG_AVAILABLE:
-            try:
-                self.rag_system = RevereRAGSystem()
-                logger.info("🎯 RAG system initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize RAG system: {e}")
-                self.rag_system = None
-        else:
-            self.rag_system = None
+        self.intent_router = IntentRouter()
+
+        # The RAG system is built by warm_up() after startup; rebuilds swap
+        # the active version underneath. Reader workers use shared_rag instead.
+        self.index_versions = None
+        self.shared_rag = None
+        self.readiness = "starting" if RAG_AVAILABLE else "unavailable"
+        if not RAG_AVAILABLE:
             logger.warning("RAG system not available, falling back to live data mode")
 
-    async def process_message(self, user_message: str) -> Dict[str, Any]:
-        """Process user message using RAG system for intelligent Q&A"""
+    def warm_up(self):
+        """Load the RAG system, embedding model and collection (blocking; run off the event loop)"""
+        if not RAG_AVAILABLE:
+            return
+
+        self.readiness = "warming"
+        started = time.time()
+        try:
+            if SERVER_ROLE == "reader":
+                self._warm_up_reader()
+            else:
+                from index_versions import IndexVersionManager
+
+                index_versions = IndexVersionManager(collection_name=RAG_COLLECTION,
+                                                     embedding_model=EMBEDDING_MODEL,
+                                                     embedding_threads=EMBEDDING_THREADS,
+                                                     max_seq_length=MAX_SEQ_LENGTH)
+                # First query pays for lazy model and index initialization
+                index_versions.active.search_handles("Revere", k=1)
+                if SERVER_ROLE == "writer":
+                    index_versions.on_swap = self.export_shared_index
+                    self.export_shared_index(index_versions.active)
+                self.index_versions = index_versions
+            self.readiness = "ready"
+            logger.info(f"🎯 RAG system initialized successfully in {time.time() - started:.1f}s")
+        except Exception as e:
+            self.readiness = "failed"
+            logger.error(f"Failed to initialize RAG system: {e}")
+
+    def _warm_up_reader(self):
+        """Map the writer's shared snapshot, waiting until the first one is exported"""
+        from rag_system import RevereRAGSystem
+        from shared_index import read_current_meta
+
+        while read_current_meta(SHARED_INDEX_DIR) is None:
+            logger.info(f"⏳ Waiting for the writer to export an index snapshot to {SHARED_INDEX_DIR}")
+            time.sleep(SHARED_INDEX_WAIT_SECONDS)
+
+        shared_rag = RevereRAGSystem(shared_index_dir=SHARED_INDEX_DIR,
+                                     embedding_threads=EMBEDDING_THREADS,
+                                     max_seq_length=MAX_SEQ_LENGTH)
+        shared_rag.search_handles("Revere", k=1)
+        self.shared_rag = shared_rag
+
+    def export_shared_index(self, rag_system=None):
+        """Publish the active index to reader workers (writer role only)"""
+        if SERVER_ROLE != "writer":
+            return
+        try:
+            from shared_index import export_snapshot
+            export_snapshot(rag_system or self.rag_system, SHARED_INDEX_DIR)
+        except Exception as e:
+            logger.error(f"Failed to export shared index snapshot: {e}")
+
+    @property
+    def rag_system(self) -> Optional["RevereRAGSystem"]:
+        """Currently active RAG index version"""
+        if self.index_versions:
+            return self.index_versions.active
+        return self.shared_rag
+
+    async def process_message(self, user_message: str,
+                              conversation_history: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Process user message using RAG system for intelligent Q&A
+
+        Args:
+            user_message: Text typed or transcribed from the client
+            conversation_history: The connection's session history, appended to in place
+        """
         start_time = time.time()
+        if conversation_history is None:
+            conversation_history = []
 
         # Add to conversation history
-        self.conversation_history.append({
+        conversation_history.append({
             "role": "user",
             "content": user_message,
             "timestamp": datetime.now().isoformat()
@@ -179,11 +339,20 @@ class EnhancedMessageProcessor:
         data_sources = []
         method = "fallback"
 
-        if self.rag_system:
+        # Small talk and live-data questions never touch the embedding model
+        intent = self.intent_router.classify(user_message)
+        INTENTS.inc(intent)
+        routed = await self._answer_intent(intent)
+        rag_system = self.rag_system
+
+        if routed:
+            response_content, data_sources = routed
+            method = f"intent_{intent}"
+        elif rag_system:
             try:
                 # Use RAG system for intelligent Q&A
                 logger.info(f"🎯 Processing question with RAG: {user_message}")
-                rag_result = self.rag_system.ask(user_message)
+                rag_result = rag_system.ask(user_message)
 
                 if rag_result and rag_result.get('answer'):
                     response_content = f"""🧠 **RAG-Powered Response:**
@@ -209,16 +378,23 @@ class EnhancedMessageProcessor:
 
                 else:
                     logger.warning("RAG system returned no answer")
+                    FALLBACKS.inc("no_answer")
                     response_content = self._generate_fallback_response(user_message)
 
             except Exception as e:
+                ERRORS.inc("rag")
+                FALLBACKS.inc("rag_error")
                 logger.error(f"RAG system error: {e}")
                 response_content = self._generate_fallback_response(user_message)
         else:
             # Fallback to conversational responses
+            FALLBACKS.inc("rag_unavailable")
             response_content = self._generate_fallback_response(user_message)
+            if self.readiness in ("starting", "warming"):
+                response_content += "\n\n⏳ My knowledge base is still loading - ask again in a moment for sourced answers."
 
         processing_time = (time.time() - start_time) * 1000
+        STAGE_SECONDS.observe(processing_time / 1000, "process_message")
 
         # Add to conversation history
         assistant_response = {
@@ -228,20 +404,52 @@ class EnhancedMessageProcessor:
             "metadata": {
                 "data_sources": data_sources,
                 "processing_time_ms": round(processing_time, 2),
-                "context_length": len(self.conversation_history),
-                "method": method
+                "context_length": len(conversation_history),
+                "method": method,
+                "intent": intent
             }
         }
 
-        self.conversation_history.append(assistant_response)
+        conversation_history.append(assistant_response)
         return assistant_response
 
-    def _generate_fallback_response(self, user_message: str) -> str:
-        """Generate fallback responses when RAG system is unavailable"""
-        user_message_lower = user_message.lower()
+    async def _answer_intent(self, intent: str) -> Optional[tuple]:
+        """
+        Answer intents that have a cheaper handler than RAG retrieval
+
+        Args:
+            intent: Intent from the router
+
+        Returns:
+            (response_content, data_sources), or None to use the knowledge base
+        """
+        if intent == GREETING:
+            return self._greeting_response(), []
+        if intent == THANKS:
+            return "😊 **You're welcome!** Anything else you'd like to know about Revere?", []
+        if intent == HELP:
+            return self._help_response(), []
+
+        # Live data; if the feed is down the knowledge base still has static info
+        if intent == TRANSIT_LIVE:
+            data = await self.data_api.fetch_mbta_data()
+            if data:
+                return self._format_mbta_response(data), [data["source"]]
+        return None
+
+    def _format_mbta_response(self, data: Dict[str, Any]) -> str:
+        arrivals = '\n'.join(f"• {arrival['station']} (to {arrival['direction']}): {arrival['minutes']} min"
+                             for arrival in data.get("next_arrivals", []))
+        if not arrivals:
+            arrivals = "No upcoming trains are predicted at Revere stations right now."
+        return f"""🚇 **Live {data['route']} Arrivals:**
 
-        if any(greeting in user_message_lower for greeting in ['hello', 'hi', 'hey']):
-            return """🌟 **Hello! Welcome to Revere's RAG-Powered AI Assistant!**
+{arrivals}
+
+📡 **Source:** {data['source']} ({data['predictions']} predictions)"""
+
+    def _greeting_response(self) -> str:
+        return """🌟 **Hello! Welcome to Revere's RAG-Powered AI Assistant!**
 
 I can answer questions about Revere using my knowledge base:
 • 🏙️ City information and history
@@ -253,8 +461,8 @@ I can answer questions about Revere using my knowledge base:
 
 Ask me anything about Revere!"""
 
-        elif any(help_word in user_message_lower for help_word in ['help', 'what can you do']):
-            return """🎯 **I'm your Revere Knowledge Assistant!**
+    def _help_response(self) -> str:
+        return """🎯 **I'm your Revere Knowledge Assistant!**
 
 📚 **What I can help with:**
 • "What is Revere Beach?" - Learn about attractions
@@ -273,8 +481,10 @@ Ask me anything about Revere!"""
 
 I search through my knowledge base to give you accurate, sourced information about Revere!"""
 
-        else:
-            return f"""🤔 **I understand you're asking:** "{user_message}"
+    def _generate_fallback_response(self, user_message: str) -> str:
+        """Generate fallback responses when RAG system is unavailable"""
+        # Greetings and help requests are answered by the intent router before this point
+        return f"""🤔 **I understand you're asking:** "{user_message}"
 
 I'm a RAG-powered assistant with knowledge about Revere, MA. I can help with:
 
@@ -297,31 +507,53 @@ class ConnectionManager:
 
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.stub_recognizer = None
+        if STT_BACKEND == "stub":
+            from stt_stub import StubRecognizer
+            self.stub_recognizer = StubRecognizer(latency_ms=STT_STUB_LATENCY_MS)
+            logger.info(f"🧪 Using stub speech recognizer ({STT_STUB_LATENCY_MS:.0f} ms per transcription)")
+        # Conversation history per connection; a session lives in the worker that accepted it
+        self.sessions: Dict[WebSocket, List[Dict[str, Any]]] = {}
         self.message_processor = EnhancedMessageProcessor()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.sessions[websocket] = []
         logger.info(f"🔗 Client connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.sessions.pop(websocket, None)
         logger.info(f"🔗 Client disconnected. Total connections: {len(self.active_connections)}")
 
     async def send_message(self, websocket: WebSocket, message: dict):
         try:
-            await websocket.send_text(json.dumps(message))
+            with STAGE_SECONDS.time("send_message"):
+                await websocket.send_text(json.dumps(message))
         except Exception as e:
+            ERRORS.inc("send_message")
             logger.error(f"Error sending message: {e}")
 
     async def process_audio_data(self, websocket: WebSocket, audio_data: bytes) -> Optional[str]:
         """Process audio data and return transcription"""
+        if self.stub_recognizer is not None:
+            with STAGE_SECONDS.time("stt"):
+                return await asyncio.to_thread(self.stub_recognizer.transcribe, audio_data)
+
         if not SPEECH_RECOGNITION_AVAILABLE:
             logger.warning("Speech recognition not available")
             return None
 
+        with STAGE_SECONDS.time("stt"):
+            return await asyncio.to_thread(self._transcribe, audio_data)
+
+    def _transcribe(self, audio_data: bytes) -> Optional[str]:
+        """Recognize speech in raw 16 kHz mono PCM (blocking; runs in a worker thread)"""
         try:
+            import speech_recognition as sr
+
             # Create a recognizer instance
             recognizer = sr.Recognizer()
 
@@ -366,10 +598,12 @@ class ConnectionManager:
                 logger.info("🤷 Could not understand audio")
                 return None
             except sr.RequestError as e:
+                ERRORS.inc("stt")
                 logger.error(f"🚫 Could not request results from speech recognition service: {e}")
                 return None
 
         except Exception as e:
+            ERRORS.inc("stt")
             logger.error(f"Error processing audio: {e}")
             return None
 
@@ -383,7 +617,7 @@ class ConnectionManager:
             })
 
             # Process message with enhanced AI
-            response = await self.message_processor.process_message(message)
+            response = await self.message_processor.process_message(message, self.sessions.get(websocket))
 
             # Send complete response
             await self.send_message(websocket, {
@@ -400,6 +634,7 @@ class ConnectionManager:
             })
 
         except Exception as e:
+            ERRORS.inc("text_message")
             logger.error(f"Error processing text message: {e}")
             await self.send_message(websocket, {
                 "type": "error",
@@ -407,10 +642,57 @@ class ConnectionManager:
                 "timestamp": datetime.now().isoformat()
             })
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the RAG system in the background once the server is accepting connections"""
+    warm_up_task = asyncio.create_task(asyncio.to_thread(manager.message_processor.warm_up))
+    yield
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+
+
 # Initialize FastAPI app and connection manager
-app = FastAPI(title="Revere Enhanced Voice Server")
+app = FastAPI(title="Revere Enhanced Voice Server", lifespan=lifespan)
 manager = ConnectionManager()
 
+
+def _ingestion_gate():
+    """Make ingestion jobs wait while an index rebuild is running"""
+    index_versions = manager.message_processor.index_versions
+    return index_versions.ingestion() if index_versions else nullcontext()
+
+
+ingest_queue = IngestJobQueue(lambda: manager.message_processor.rag_system,
+                              max_workers=INGEST_WORKERS,
+                              on_complete=lambda job: manager.message_processor.export_shared_index(),
+                              gate=_ingestion_gate,
+                              keep_dir=INDEX_UPLOAD_DIR)
+
+
+# Each cache counts from zero, so scrapes fold what the active one counted since the
+# last scrape into process-wide totals that keep rising across index swaps
+_cache_lookup_totals = {"hit": 0, "miss": 0}
+_cache_lookups_seen = weakref.WeakKeyDictionary()
+
+
+def _embedding_cache_lookups():
+    rag_system = manager.message_processor.rag_system
+    cache = rag_system.embedding_cache if rag_system else None
+    if cache is not None:
+        stats = cache.get_statistics()
+        seen = _cache_lookups_seen.setdefault(cache, {"hit": 0, "miss": 0})
+        for result, key in (("hit", 'hits'), ("miss", 'misses')):
+            _cache_lookup_totals[result] += stats[key] - seen[result]
+            seen[result] = stats[key]
+    return {(result,): count for result, count in _cache_lookup_totals.items()}
+
+
+# Gauges and cache counters are read when /metrics is scraped, not on the hot path
+ACTIVE_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+INGEST_QUEUE_DEPTH.set_function(ingest_queue.pending_count)
+RAG_READY.set_function(lambda: int(manager.message_processor.readiness == "ready"))
+EMBEDDING_CACHE_LOOKUPS.set_function(_embedding_cache_lookups)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -430,6 +712,11 @@ async def websocket_endpoint(websocket: WebSocket):
             # Handle different message types
             message = await websocket.receive()
 
+            # receive() returns the disconnect message instead of raising
+            if message["type"] == "websocket.disconnect":
+                manager.disconnect(websocket)
+                break
+
             if message["type"] == "websocket.receive":
                 if "text" in message:
                     # Handle JSON messages
@@ -481,9 +768,156 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
+        ERRORS.inc("websocket")
         logger.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
 
+# Upper bounds on one batch request, so a single call cannot tie up the embedding
+# thread or stream an unbounded response
+MAX_BATCH_QUERIES = 10000
+MAX_RESULTS_PER_QUERY = 50
+MAX_SNIPPET_CHARS = 2000
+
+# Queries per batched encode/query round trip while streaming results
+BATCH_CHUNK_SIZE = 256
+
+
+class BatchSearchRequest(BaseModel):
+    """Body of the batch search endpoint"""
+    queries: List[str] = Field(max_length=MAX_BATCH_QUERIES)
+    k: int = Field(default=5, ge=1, le=MAX_RESULTS_PER_QUERY)
+    filter: Optional[Dict[str, Any]] = None
+    include_content: bool = True
+    snippet_chars: Optional[int] = Field(default=None, ge=0, le=MAX_SNIPPET_CHARS)
+
+
+class BatchAskRequest(BaseModel):
+    """Body of the batch question answering endpoint"""
+    questions: List[str] = Field(max_length=MAX_BATCH_QUERIES)
+    use_llm: bool = False
+    snippet_chars: int = Field(default=200, ge=1, le=MAX_SNIPPET_CHARS)
+
+
+def _rag_unavailable() -> HTTPException:
+    if manager.message_processor.readiness in ("starting", "warming"):
+        return HTTPException(status_code=503, detail="RAG system is warming up",
+                             headers={"Retry-After": "5"})
+    return HTTPException(status_code=503, detail="RAG system not available")
+
+
+def _require_writer():
+    if SERVER_ROLE == "reader":
+        raise HTTPException(status_code=409,
+                            detail="This worker serves queries only; send ingestion and index changes to the writer")
+
+
+def _require_rag_system():
+    rag_system = manager.message_processor.rag_system
+    if rag_system is None:
+        raise _rag_unavailable()
+    return rag_system
+
+
+@app.post("/search/batch")
+async def search_batch(request: BatchSearchRequest):
+    """Run many searches in batched vector queries, streamed back as NDJSON"""
+    rag_system = _require_rag_system()
+
+    def run_chunk(queries: List[str]) -> List[List[Dict[str, Any]]]:
+        all_handles = rag_system.search_handles_batch(queries, k=request.k,
+                                                      filter_metadata=request.filter)
+        return [
+            rag_system.fetch_documents(handles,
+                                       include_content=request.include_content,
+                                       snippet_query=query if request.snippet_chars else None,
+                                       snippet_chars=request.snippet_chars or 0)
+            for query, handles in zip(queries, all_handles)
+        ]
+
+    async def stream():
+        for start in range(0, len(request.queries), BATCH_CHUNK_SIZE):
+            queries = request.queries[start:start + BATCH_CHUNK_SIZE]
+            results = await asyncio.to_thread(run_chunk, queries)
+            lines = [
+                json.dumps({"index": start + i, "query": query, "results": documents})
+                for i, (query, documents) in enumerate(zip(queries, results))
+            ]
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchAskRequest):
+    """Answer many questions with batched retrieval, streamed back as NDJSON"""
+    rag_system = _require_rag_system()
+
+    async def stream():
+        for start in range(0, len(request.questions), BATCH_CHUNK_SIZE):
+            questions = request.questions[start:start + BATCH_CHUNK_SIZE]
+            results = await asyncio.to_thread(rag_system.ask_batch, questions,
+                                              request.use_llm, request.snippet_chars)
+            lines = [json.dumps({"index": start + i, **result}) for i, result in enumerate(results)]
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _spool_upload(upload: UploadFile) -> str:
+    """Copy an upload to the spool directory one chunk at a time"""
+    os.makedirs(INGEST_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(upload.filename or "")[1].lower()
+    path = os.path.join(INGEST_SPOOL_DIR, f"{uuid.uuid4().hex}{extension}")
+
+    with open(path, 'wb') as spool_file:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            await asyncio.to_thread(spool_file.write, chunk)
+    await upload.close()
+    return path
+
+
+@app.post("/ingest", status_code=202)
+async def ingest(files: List[UploadFile] = File(...)):
+    """Accept document uploads and queue them for background ingestion"""
+    _require_writer()
+    _require_rag_system()
+
+    for upload in files:
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise HTTPException(status_code=415, detail=f"Unsupported file type: {upload.filename}")
+
+    jobs = []
+    for upload in files:
+        path = await _spool_upload(upload)
+        try:
+            job = ingest_queue.submit(os.path.basename(upload.filename), path)
+        except QueueFullError as e:
+            os.remove(path)
+            raise HTTPException(status_code=429, detail=str(e))
+        jobs.append(job.to_dict())
+
+    return {"jobs": jobs}
+
+
+@app.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    """Progress of a background ingestion job"""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return job.to_dict()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms, counters and gauges in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -496,13 +930,19 @@ async def health_check():
 
     return {
         "status": "healthy",
+        "ready": manager.message_processor.readiness == "ready",
+        "readiness": manager.message_processor.readiness,
+        "role": SERVER_ROLE,
+        "pid": os.getpid(),
         "timestamp": datetime.now().isoformat(),
         "active_connections": len(manager.active_connections),
         "rag_system": {
             "available": RAG_AVAILABLE,
             "initialized": manager.message_processor.rag_system is not None,
+            "index": manager.message_processor.index_versions.get_status() if manager.message_processor.index_versions else None,
             "statistics": rag_stats
         },
+        "stt_backend": STT_BACKEND,
         "features": [
             "RAG-Powered Q&A System",
             "Semantic Document Search",
@@ -512,6 +952,165 @@ async def health_check():
         ]
     }
 
+async def _require_admin(x_admin_token: str = Header(default="")):
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(_require_admin)])
+index = APIRouter(prefix="/index", dependencies=[Depends(_require_admin)])
+_profile_lock = asyncio.Lock()
+_tracemalloc_session = None
+
+
+@admin.get("/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(seconds: float = 10.0, interval_ms: float = 5.0, include_idle: bool = False):
+    """Sample all threads for a while and return folded stacks for flamegraph tools"""
+    from profiling import sample_cpu_profile
+
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+    async with _profile_lock:
+        profile = await asyncio.to_thread(sample_cpu_profile, seconds, interval_ms / 1000, include_idle)
+
+    logger.info(f"🔬 CPU profile: {profile['samples']} samples over {profile['seconds']}s")
+    return PlainTextResponse(profile["folded"], headers={
+        "Content-Disposition": f"attachment; filename=revere-{os.getpid()}-{int(time.time())}.folded",
+        "X-Profile-Samples": str(profile["samples"]),
+        "X-Profile-Seconds": str(profile["seconds"])
+    })
+
+
+@admin.post("/memory/tracemalloc/start")
+async def tracemalloc_start(frames: int = 10):
+    """Start tracing allocations and take the baseline snapshot"""
+    global _tracemalloc_session
+    from profiling import TracemallocSession
+
+    if _tracemalloc_session is None:
+        _tracemalloc_session = TracemallocSession()
+    await asyncio.to_thread(_tracemalloc_session.start, frames)
+    return {"tracing": True, "since": _tracemalloc_session.started_at}
+
+
+@admin.get("/memory/tracemalloc")
+async def tracemalloc_diff(limit: int = 25, group_by: str = "lineno"):
+    """Largest allocation changes since tracing started"""
+    if _tracemalloc_session is None or not _tracemalloc_session.active:
+        raise HTTPException(status_code=409, detail="tracemalloc is not running; POST /admin/memory/tracemalloc/start")
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by must be lineno, filename or traceback")
+    return await asyncio.to_thread(_tracemalloc_session.diff, limit, group_by)
+
+
+@admin.post("/memory/tracemalloc/stop")
+async def tracemalloc_stop():
+    """Stop tracing allocations so the hot path runs at full speed again"""
+    if _tracemalloc_session is not None:
+        _tracemalloc_session.stop()
+    return {"tracing": False}
+
+
+@admin.get("/memory")
+async def memory_report():
+    """Process RSS plus byte sizes of the main in-process structures"""
+    from profiling import deep_sizeof, process_memory, rag_memory_report
+
+    def build():
+        sessions = dict(manager.sessions)
+        return {
+            "pid": os.getpid(),
+            "process": process_memory(),
+            "connections": {
+                "count": len(manager.active_connections),
+                "list_bytes": deep_sizeof(manager.active_connections)
+            },
+            "conversation_history": {
+                "sessions": len(sessions),
+                "messages": sum(len(history) for history in sessions.values()),
+                "bytes": deep_sizeof(list(sessions.values()))
+            },
+            "ingest_jobs": {"count": len(ingest_queue.jobs), "bytes": deep_sizeof(ingest_queue.jobs)},
+            "rag_system": rag_memory_report(manager.message_processor.rag_system)
+        }
+
+    return await asyncio.to_thread(build)
+
+
+class RebuildRequest(BaseModel):
+    """Body of the index rebuild endpoint (uploaded files are always included)"""
+    paths: List[str] = []
+    embedding_model: Optional[str] = None
+    max_chunk_chars: int = 1200
+    validation_queries: List[str] = []
+    min_documents: Optional[int] = None
+
+
+def _require_index_versions() -> "IndexVersionManager":
+    _require_writer()
+    index_versions = manager.message_processor.index_versions
+    if index_versions is None:
+        raise _rag_unavailable()
+    return index_versions
+
+
+def _resolve_source_path(path: str) -> str:
+    """Resolve a rebuild path relative to INDEX_SOURCE_DIR, rejecting anything outside it"""
+    root = os.path.realpath(INDEX_SOURCE_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise HTTPException(status_code=400, detail=f"Path is outside the index source directory: {path}")
+    return resolved
+
+
+@index.get("")
+async def index_status():
+    """Active and previous index versions and rebuild progress"""
+    return _require_index_versions().get_status()
+
+
+@index.post("/rebuild", status_code=202)
+async def index_rebuild(request: RebuildRequest):
+    """Build a new index version in the background and switch to it once validated"""
+    index_versions = _require_index_versions()
+    paths = [_resolve_source_path(path) for path in request.paths]
+    missing = [path for path, resolved in zip(request.paths, paths) if not os.path.isfile(resolved)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Files not found: {', '.join(missing)}")
+
+    # Documents ingested through /ingest must survive the swap
+    if os.path.isdir(INDEX_UPLOAD_DIR):
+        uploads = sorted(os.path.realpath(entry.path) for entry in os.scandir(INDEX_UPLOAD_DIR) if entry.is_file())
+        paths += [path for path in uploads if path not in paths]
+    if not paths:
+        raise HTTPException(status_code=400, detail="No source files to rebuild from")
+
+    started = index_versions.start_rebuild(
+        paths=paths,
+        embedding_model=request.embedding_model,
+        max_chunk_chars=request.max_chunk_chars,
+        validation_queries=request.validation_queries,
+        min_documents=request.min_documents
+    )
+    if not started:
+        raise HTTPException(status_code=409, detail="A rebuild is already running")
+    return index_versions.get_status()
+
+
+@index.post("/rollback")
+async def index_rollback():
+    """Switch back to the previous index version"""
+    index_versions = _require_index_versions()
+    if not await asyncio.to_thread(index_versions.rollback):
+        raise HTTPException(status_code=409, detail="No previous index version to roll back to")
+    return index_versions.get_status()
+
+
+if ADMIN_TOKEN:
+    app.include_router(admin)
+    app.include_router(index)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with server info"""
@@ -521,7 +1120,12 @@ async def root():
         "description": "Intelligent voice chat with RAG system for document-based Q&A about Revere",
         "endpoints": {
             "websocket": "/ws",
-            "health": "/health"
+            "health": "/health",
+            "metrics": "/metrics",
+            "search_batch": "/search/batch",
+            "ask_batch": "/ask/batch",
+            "ingest": "/ingest",
+            "index": "/index"
         },
         "capabilities": [
             "RAG-powered question answering using vector database",
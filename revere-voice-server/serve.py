@@ -0,0 +1,67 @@
+# serve.py - Production launcher: one ingestion writer plus N query workers
+import os
+import sys
+import signal
+import logging
+import argparse
+import multiprocessing
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _run_writer(host: str, port: int):
+    """Single process owning the vector database, ingestion and index rebuilds"""
+    os.environ["REVERE_ROLE"] = "writer"
+    uvicorn.run("revere_enhanced_server:app", host=host, port=port, workers=1, log_level="info")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Revere voice server with multiple worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001, help="Port for WebSocket and query traffic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of query worker processes")
+    parser.add_argument("--writer-host", default="127.0.0.1", help="Interface for the ingestion/admin writer")
+    parser.add_argument("--writer-port", type=int, default=8002)
+    parser.add_argument("--shared-index-dir", default=os.environ.get("REVERE_SHARED_INDEX_DIR",
+                                                                     "./revere_rag_db/shared_index"))
+    args = parser.parse_args()
+
+    # Both roles inherit the snapshot location through the environment
+    os.environ["REVERE_SHARED_INDEX_DIR"] = os.path.abspath(args.shared_index_dir)
+
+    # The writer is the only process that loads the full vector store; readers
+    # map its exported snapshot, so each worker keeps only the query model in memory.
+    # The writer also exports that model to ONNX, so readers embed queries without
+    # PyTorch when onnxruntime and tokenizers are installed; the mapped snapshot is
+    # shared via the page cache. To compare a reader's footprint with and without
+    # the ONNX export, run with REVERE_ADMIN_TOKEN set, send some queries, and read
+    # process.vmrss_bytes (and the answering pid) from a worker:
+    #   curl -H "X-Admin-Token: $REVERE_ADMIN_TOKEN" http://localhost:8001/admin/memory
+    writer = multiprocessing.get_context("spawn").Process(
+        target=_run_writer, args=(args.writer_host, args.writer_port), name="revere-writer")
+    writer.start()
+    logger.info(f"✍️ Writer (ingestion, /index) on http://{args.writer_host}:{args.writer_port}, pid {writer.pid}")
+
+    def stop_writer(*_):
+        if writer.is_alive():
+            writer.terminate()
+            writer.join(timeout=10)
+
+    signal.signal(signal.SIGTERM, lambda *_: (stop_writer(), sys.exit(0)))
+
+    # Workers share one listening socket; the kernel spreads new connections
+    # across them and each WebSocket session stays in the worker that accepted it
+    os.environ["REVERE_ROLE"] = "reader"
+    logger.info(f"🚀 Starting {args.workers} query workers on {args.host}:{args.port}")
+    try:
+        uvicorn.run("revere_enhanced_server:app", host=args.host, port=args.port,
+                    workers=args.workers, reload=False, log_level="info")
+    finally:
+        stop_writer()
+
+
+if __name__ == "__main__":
+    main()
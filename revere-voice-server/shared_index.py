@@ -0,0 +1,306 @@
+# Read-only, memory-mapped index snapshots shared between server workers
+import os
+import re
+import json
+import mmap
+import time
+import shutil
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from embedders import export_onnx_model, is_gemini_model, is_hashing_model
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+EXPORT_PAGE_SIZE = 5000
+QUERY_MODEL_DIR = "query_models"
+
+
+def _iter_documents(rag) -> List[Dict[str, Any]]:
+    """Yield pages of {id, content, metadata, embedding} from a RAG system's store"""
+    if rag.collection:
+        offset = 0
+        while True:
+            page = rag.collection.get(include=['embeddings', 'documents', 'metadatas'],
+                                      limit=EXPORT_PAGE_SIZE, offset=offset)
+            if not page['ids']:
+                break
+            yield [
+                {'id': doc_id, 'content': content, 'metadata': metadata or {}, 'embedding': embedding}
+                for doc_id, content, metadata, embedding in zip(
+                    page['ids'], page['documents'], page['metadatas'], page['embeddings'])
+            ]
+            offset += len(page['ids'])
+    else:
+        for start in range(0, len(rag.memory_store), EXPORT_PAGE_SIZE):
+            yield rag.memory_store[start:start + EXPORT_PAGE_SIZE]
+
+
+def export_query_model(model_name: str, directory: str) -> Optional[str]:
+    """
+    Export the writer's sentence-transformers model to ONNX for reader workers
+
+    Readers then embed queries with ONNX Runtime instead of loading PyTorch
+    and the full model. The export is full precision, so query vectors match
+    the stored document vectors, and runs once per model.
+
+    Args:
+        model_name: Embedding model of the exported index
+        directory: Shared snapshot directory
+
+    Returns:
+        "onnx:<dir>" model name for readers, or None if the model is not a
+        sentence-transformers model or cannot be exported here
+    """
+    if is_hashing_model(model_name) or is_gemini_model(model_name) or model_name.startswith("onnx:"):
+        return None
+
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+    output_dir = os.path.abspath(os.path.join(directory, QUERY_MODEL_DIR, safe_name))
+    if not os.path.isdir(output_dir):
+        staging = f"{output_dir}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            export_onnx_model(model_name, staging, quantize=False)
+        except Exception as e:
+            logger.warning(f"Readers will load {model_name} in full, ONNX export failed: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+        os.rename(staging, output_dir)
+    return f"onnx:{output_dir}"
+
+
+def export_snapshot(rag, directory: str, keep: int = 2) -> str:
+    """
+    Write the RAG system's documents as a memory-mappable snapshot
+
+    Each snapshot is a directory with a normalized float32 embedding matrix
+    (.npy), concatenated UTF-8 contents and metadata JSON with offset arrays,
+    and the document IDs. The CURRENT file is switched to the new snapshot
+    atomically, so readers never see a partial write.
+
+    The query model is exported alongside (see export_query_model).
+
+    Args:
+        rag: RevereRAGSystem to export (the single writer)
+        directory: Shared snapshot directory
+        keep: Number of snapshots kept on disk
+
+    Returns:
+        Path of the new snapshot
+    """
+    started = time.time()
+    os.makedirs(directory, exist_ok=True)
+    query_model = export_query_model(rag.embedding_model_name, directory)
+    name = f"snapshot-{int(time.time() * 1000)}"
+    path = os.path.join(directory, name)
+    staging = f"{path}.tmp"
+    os.makedirs(staging)
+
+    ids, content_offsets, metadata_offsets, vectors = [], [0], [0], []
+    with rag._write_lock, \
+            open(os.path.join(staging, "content.bin"), 'wb') as content_file, \
+            open(os.path.join(staging, "metadata.bin"), 'wb') as metadata_file:
+        for page in _iter_documents(rag):
+            for doc in page:
+                ids.append(doc['id'])
+                content = doc['content'].encode()
+                content_file.write(content)
+                content_offsets.append(content_offsets[-1] + len(content))
+                metadata = json.dumps(doc['metadata']).encode()
+                metadata_file.write(metadata)
+                metadata_offsets.append(metadata_offsets[-1] + len(metadata))
+                vectors.append(np.asarray(doc['embedding'], dtype=np.float32))
+
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    if len(matrix):
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    np.save(os.path.join(staging, "embeddings.npy"), matrix)
+    np.save(os.path.join(staging, "content_offsets.npy"), np.asarray(content_offsets, dtype=np.int64))
+    np.save(os.path.join(staging, "metadata_offsets.npy"), np.asarray(metadata_offsets, dtype=np.int64))
+    with open(os.path.join(staging, "ids.json"), 'w', encoding='utf-8') as file:
+        json.dump(ids, file)
+    with open(os.path.join(staging, "meta.json"), 'w', encoding='utf-8') as file:
+        json.dump({
+            'collection': rag.collection_name,
+            'embedding_model': rag.embedding_model_name,
+            'query_model': query_model,
+            'dimension': int(matrix.shape[1]) if len(matrix) else 0,
+            'count': len(ids),
+            'created_at': time.time()
+        }, file)
+
+    os.rename(staging, path)
+    tmp_pointer = os.path.join(directory, f"{CURRENT_FILE}.tmp")
+    with open(tmp_pointer, 'w') as file:
+        file.write(name)
+    os.replace(tmp_pointer, os.path.join(directory, CURRENT_FILE))
+
+    # Older snapshots stay mapped by readers until they reload, so keep a few
+    snapshots = sorted(entry for entry in os.listdir(directory)
+                       if entry.startswith("snapshot-") and not entry.endswith(".tmp"))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+
+    logger.info(f"📸 Exported index snapshot {name}: {len(ids)} documents in {time.time() - started:.2f}s")
+    return path
+
+
+def read_current_meta(directory: str) -> Optional[Dict[str, Any]]:
+    """Metadata of the current snapshot, or None if nothing was exported yet"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), 'r') as file:
+            name = file.read().strip()
+        with open(os.path.join(directory, name, "meta.json"), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+class _Snapshot:
+    """One loaded snapshot; replaced as a whole so readers never mix versions"""
+
+    def __init__(self, path: str, name: str):
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as file:
+            self.meta = json.load(file)
+        with open(os.path.join(path, "ids.json"), 'r', encoding='utf-8') as file:
+            self.ids: List[str] = json.load(file)
+
+        self.name = name
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+        self.content_offsets = np.load(os.path.join(path, "content_offsets.npy"), mmap_mode='r')
+        self.metadata_offsets = np.load(os.path.join(path, "metadata_offsets.npy"), mmap_mode='r')
+        self.contents = self._map_bytes(os.path.join(path, "content.bin"))
+        self.metadatas = self._map_bytes(os.path.join(path, "metadata.bin"))
+        self.id_rows: Optional[Dict[str, int]] = None
+        self.categories: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def _map_bytes(path: str):
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def content(self, row: int) -> str:
+        return self.contents[self.content_offsets[row]:self.content_offsets[row + 1]].decode()
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        return json.loads(self.metadatas[self.metadata_offsets[row]:self.metadata_offsets[row + 1]])
+
+
+class SharedIndexReader:
+    """
+    Read-only view of the current snapshot in a shared directory
+
+    Embeddings, contents and metadata are memory-mapped, so every worker
+    process on the host shares one copy in the page cache and per-worker
+    memory stays small. Readers check for a newer snapshot at most every
+    refresh_interval seconds.
+    """
+
+    def __init__(self, directory: str, refresh_interval: float = 2.0):
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self.refresh(force=True)
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return self.snapshot.meta if self.snapshot else {}
+
+    @property
+    def count(self) -> int:
+        return len(self.snapshot.ids) if self.snapshot else 0
+
+    def refresh(self, force: bool = False) -> bool:
+        """Switch to a newer snapshot if one was exported; returns True if switched"""
+        now = time.time()
+        if not force and now - self._last_check < self.refresh_interval:
+            return False
+        self._last_check = now
+
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE), 'r') as file:
+                name = file.read().strip()
+        except OSError:
+            return False
+
+        with self._lock:
+            if self.snapshot and self.snapshot.name == name:
+                return False
+            self.snapshot = _Snapshot(os.path.join(self.directory, name), name)
+
+        logger.info(f"📖 Loaded index snapshot {name}: {self.count} documents")
+        return True
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Cosine top-k over the shared embedding matrix
+
+        Args:
+            query_embeddings: (queries, dim) matrix
+            k: Results per query
+
+        Returns:
+            Handles per query; each carries its snapshot row for cheap hydration
+        """
+        self.refresh()
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.ids:
+            return [[] for _ in range(len(query_embeddings))]
+
+        queries = np.array(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ snapshot.embeddings.T
+        top = min(k, len(snapshot.ids))
+
+        results = []
+        for row_scores in scores:
+            best = np.argpartition(-row_scores, top - 1)[:top]
+            best = best[np.argsort(-row_scores[best])]
+            results.append([
+                {'id': snapshot.ids[row], 'distance': float(1 - row_scores[row]),
+                 'row': int(row), 'snapshot': snapshot.name}
+                for row in best
+            ])
+        return results
+
+    def fetch(self, handles: List[Dict[str, Any]]) -> Dict[str, tuple]:
+        """Map handle IDs to (content, metadata) read from the mapped files"""
+        snapshot = self.snapshot
+        stored = {}
+        if snapshot is None:
+            return stored
+
+        for handle in handles:
+            if handle.get('snapshot') == snapshot.name and 'row' in handle:
+                row = handle['row']
+            else:
+                if snapshot.id_rows is None:
+                    snapshot.id_rows = {doc_id: row for row, doc_id in enumerate(snapshot.ids)}
+                row = snapshot.id_rows.get(handle['id'])
+                if row is None:
+                    continue
+            stored[handle['id']] = (snapshot.content(row), snapshot.metadata(row))
+        return stored
+
+    def category_counts(self) -> Dict[str, int]:
+        """Document count per metadata category (computed once per snapshot)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {}
+        if snapshot.categories is None:
+            categories: Dict[str, int] = {}
+            for row in range(len(snapshot.ids)):
+                category = snapshot.metadata(row).get('category', 'uncategorized')
+                categories[category] = categories.get(category, 0) + 1
+            snapshot.categories = categories
+        return snapshot.categories
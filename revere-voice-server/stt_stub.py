@@ -0,0 +1,92 @@
+# Deterministic local stand-ins for the speech recognition service and the MBTA feed
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+# Transcripts cover the greeting, live transit and knowledge base routes so audio
+# load exercises the same paths as real traffic (weather and trash go to the knowledge base)
+STUB_TRANSCRIPTS: List[str] = [
+    "What is Revere Beach?",
+    "How do I contact City Hall?",
+    "When is the next Blue Line train?",
+    "Tell me about schools in Revere",
+    "What is the weather today?",
+    "When is trash pickup?",
+    "Hello there",
+    "What development projects are happening in Revere?",
+]
+
+# 16-bit samples quieter than this are treated as silence
+SILENCE_THRESHOLD = 200
+
+# Minutes until each stubbed Blue Line arrival: (stop id, stop name, direction_id, minutes)
+STUB_ARRIVALS = [
+    ("place-wondl", "Wonderland", 0, 3),
+    ("place-rbmnl", "Revere Beach", 1, 5),
+    ("place-wondl", "Wonderland", 0, 11),
+]
+
+
+class StubRecognizer:
+    """
+    Maps raw 16 kHz mono PCM to a fixed transcript without any network calls
+
+    The transcript is chosen by a CRC32 of the audio, so the same frame always
+    gives the same text. Frames whose peak amplitude is below
+    SILENCE_THRESHOLD are reported as no speech. An optional fixed latency
+    imitates the cost of a real recognizer.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, transcripts: Optional[List[str]] = None):
+        """
+        Args:
+            latency_ms: Time spent per transcription (slept in the calling thread)
+            transcripts: Candidate transcripts (defaults to STUB_TRANSCRIPTS)
+        """
+        self.latency = latency_ms / 1000
+        self.transcripts = transcripts or STUB_TRANSCRIPTS
+
+    def transcribe(self, audio_data: bytes) -> Optional[str]:
+        """
+        Args:
+            audio_data: Raw little-endian 16-bit PCM
+
+        Returns:
+            Transcript, or None for silence or empty frames
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        samples = np.frombuffer(audio_data[:len(audio_data) // 2 * 2], dtype='<i2')
+        if not len(samples) or int(np.abs(samples.astype(np.int32)).max()) < SILENCE_THRESHOLD:
+            return None
+        return self.transcripts[zlib.crc32(audio_data) % len(self.transcripts)]
+
+
+def stub_mbta_predictions() -> Dict[str, Any]:
+    """
+    MBTA v3 predictions payload for STUB_ARRIVALS, timed from now
+
+    Used in place of the live API under the stub backend, so load runs
+    never spend the MBTA rate limit.
+
+    Returns:
+        Dictionary shaped like the /predictions response with included stops
+    """
+    now = datetime.now(timezone.utc)
+    predictions = []
+    stops = {}
+    for i, (stop_id, name, direction, minutes) in enumerate(STUB_ARRIVALS):
+        # Half a minute of slack so the answer still reads "minutes" after rounding down
+        arrival = now + timedelta(minutes=minutes, seconds=30)
+        predictions.append({
+            "id": f"stub-{i}",
+            "type": "prediction",
+            "attributes": {"arrival_time": arrival.isoformat(), "direction_id": direction},
+            "relationships": {"stop": {"data": {"id": stop_id, "type": "stop"}}}
+        })
+        stops[stop_id] = {"id": stop_id, "type": "stop", "attributes": {"name": name}}
+    return {"data": predictions, "included": list(stops.values())}
@@ -0,0 +1,50 @@
+# Regression tests for near-duplicate detection (run with: python -m pytest test_dedup.py)
+from dedup import NearDuplicateIndex
+
+FY2024_TABLE = """| Department | Personnel | Expenses | Total |
+|------------|-----------|----------|-------|
+| Public Works | 4,512,300 | 2,104,880 | 6,617,180 |
+| Snow and Ice | 310,000 | 1,250,000 | 1,560,000 |
+| Parks and Recreation | 1,020,450 | 388,200 | 1,408,650 |
+| Library | 905,120 | 210,400 | 1,115,520 |"""
+
+FY2025_TABLE = """| Department | Personnel | Expenses | Total |
+|------------|-----------|----------|-------|
+| Public Works | 4,688,900 | 2,230,115 | 6,919,015 |
+| Snow and Ice | 325,000 | 1,400,000 | 1,725,000 |
+| Parks and Recreation | 1,061,200 | 401,900 | 1,463,100 |
+| Library | 941,330 | 222,050 | 1,163,380 |"""
+
+
+def test_tables_differing_only_in_figures_are_kept():
+    index = NearDuplicateIndex()
+    assert index.add("fy2024", FY2024_TABLE) is None
+    assert index.add("fy2025", FY2025_TABLE) is None
+
+
+def test_reformatted_table_is_a_duplicate():
+    index = NearDuplicateIndex()
+    index.add("fy2025", FY2025_TABLE)
+    assert index.add("fy2025-copy", FY2025_TABLE.replace("| ", "|  ")) == "fy2025"
+
+
+def test_boilerplate_differing_by_page_number_is_a_duplicate():
+    index = NearDuplicateIndex()
+    index.add("p41", "CITY OF REVERE FY2025 ANNUAL BUDGET Section 3 General Fund Page 41")
+    assert index.add("p42", "CITY OF REVERE FY2025 ANNUAL BUDGET Section 3 General Fund Page 42") == "p41"
+    index.add("d4", "Disclaimer: figures are estimates. Page 4")
+    assert index.add("d5", "Disclaimer: figures are estimates. Page 5") == "d4"
+
+
+def test_fiscal_year_is_not_a_page_marker():
+    index = NearDuplicateIndex()
+    index.add("fy24", "CITY OF REVERE FY2024 ANNUAL BUDGET Section 3 General Fund Page 41")
+    assert index.add("fy25", "CITY OF REVERE FY2025 ANNUAL BUDGET Section 3 General Fund Page 41") is None
+
+
+def test_retained_canonical_outlives_its_source():
+    index = NearDuplicateIndex()
+    index.add("a", FY2025_TABLE)
+    index.add("b", FY2025_TABLE + "\n")
+    assert index.remove(["a"]) == []
+    assert sorted(index.remove(["b"])) == ["a", "b"]